@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import metrics
+
+admitted_total = metrics.registry.counter("chatbot_admitted_total", "Requests admitted, by mode.", ["mode"])
+rejected_total = metrics.registry.counter("chatbot_rejected_total", "Requests shed before any work was done, by reason.",
+                                          ["reason"])
+queue_wait_seconds = metrics.registry.histogram("chatbot_queue_wait_seconds", "Time admitted requests waited for a slot.")
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after  # seconds, sent back as the Retry-After header
+
+
+class AdmissionController:  # a fixed number of requests run at once; a bounded number wait a bounded time for a slot
+    def __init__(self, max_in_flight=None, max_queue=None, max_wait=None, degrade_at=None, retry_after=None):
+        self.max_in_flight = max_in_flight if max_in_flight is not None else int(os.environ.get("CHATBOT_MAX_IN_FLIGHT", 8))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("CHATBOT_MAX_QUEUE", 32))
+        self.max_wait = max_wait if max_wait is not None else float(os.environ.get("CHATBOT_MAX_WAIT", 2.0))
+        # Requests admitted while at least this many are in flight or queued get the cheap intent-only answer; 0 disables.
+        self.degrade_at = degrade_at if degrade_at is not None else int(os.environ.get("CHATBOT_DEGRADE_AT", 0))
+        self.retry_after = retry_after if retry_after is not None else int(os.environ.get("CHATBOT_RETRY_AFTER", 1))
+        self.slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+
+    @contextmanager
+    def admit(self):  # `with admission.admit() as degraded: ...`; raises Overloaded instead of queueing forever
+        if not self.slots.acquire(blocking=False):
+            self.wait_for_slot()
+        with self.lock:
+            self.in_flight += 1
+            degraded = bool(self.degrade_at) and self.in_flight + self.waiting >= self.degrade_at
+        admitted_total.inc(mode="degraded" if degraded else "full")
+        try:
+            yield degraded
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+    def wait_for_slot(self):
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                rejected_total.inc(reason="queue_full")
+                raise Overloaded("queue_full", self.retry_after)
+            self.waiting += 1
+        started = time.perf_counter()
+        try:
+            acquired = self.slots.acquire(timeout=self.max_wait) if self.max_wait > 0 else False
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        if acquired:
+            queue_wait_seconds.observe(time.perf_counter() - started)
+        else:
+            rejected_total.inc(reason="timeout")
+            raise Overloaded("timeout", self.retry_after)
+
+    def stats(self):
+        with self.lock:
+            return {"in_flight": self.in_flight, "waiting": self.waiting, "max_in_flight": self.max_in_flight,
+                    "max_queue": self.max_queue, "max_wait": self.max_wait, "degrade_at": self.degrade_at}
@@ -1,18 +1,32 @@
+import hmac
+import os
+import signal
+import time
 from flask import jsonify
-from flask import Flask, request, render_template_string, session, url_for, redirect
-from flask_session import Session  # Make sure to install this with `pip install Flask-Session`
-from chatbot import IntentClassifier, ProcessingData, RouteFinder, ChatBot
+from flask import Flask, Response, request, render_template_string, session, url_for, redirect
+from chatbot import ConversationState
+from hot_reload import ChatBotReloader
+import metrics
+from admission import AdmissionController, Overloaded
+from batching import MessageBatcher
+from history import history_writer
+from sessions import StoreSessionInterface, session_store_from_env
 
 app = Flask(__name__)
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-Session(app)
+# Sessions hold the conversation state and the last few chat lines; CHATBOT_SESSION_BACKEND=sqlite shares them between workers
+app.session_interface = StoreSessionInterface(session_store_from_env(),
+                                              max_messages=int(os.environ.get("CHATBOT_SESSION_MESSAGES", 20)))
 
-# Initialize components of your ChatBot
-classifier = IntentClassifier("./intents.json")
-data_processor = ProcessingData("./airlines_reviews.csv")
-route_finder = RouteFinder(data_processor, ["Route", "Airline"])
-chat_bot = ChatBot(classifier, route_finder, data_processor, "./analyzed_sentiment_result.csv")
+# Initialize components of your ChatBot; the reloader swaps in a fresh one when the data files change
+reloader = ChatBotReloader("./intents.json", "./airlines_reviews.csv", "./analyzed_sentiment_result.csv")
+WATCH_INTERVAL = float(os.environ.get("CHATBOT_WATCH_INTERVAL", 5))  # seconds, 0 disables the file watcher
+ADMIN_TOKEN = os.environ.get("CHATBOT_ADMIN_TOKEN")
+HISTORY_PATH = "./conversation_history.txt"
+history_writer(HISTORY_PATH, max_bytes=50 * 1024 * 1024, rotate_daily=True, compress=True)  # rotation settings for the shared writer
+profiler = metrics.SlowRequestProfiler()  # off unless CHATBOT_PROFILE_RATE > 0
+admission = AdmissionController()  # CHATBOT_MAX_IN_FLIGHT, CHATBOT_MAX_QUEUE, CHATBOT_MAX_WAIT, CHATBOT_DEGRADE_AT
+batcher = MessageBatcher()  # off unless CHATBOT_BATCH_MAX_WAIT_MS > 0; CHATBOT_BATCH_MAX_SIZE caps a batch
 
 HTML = """
 <!DOCTYPE html>
@@ -171,36 +185,73 @@ HTML = """
 
 """
 
-def handle_user_message(user_input):
-    chat_bot.set_user_message(user_input)
-    if chat_bot.tag == "airline":
-        response = chat_bot.airline_tag_response()
-    elif chat_bot.tag == "recommended_airlines":
-        response = chat_bot.recommended_airlines_responses(user_input, chat_bot.conversation_state)
-    else:
-        response = chat_bot.other_tags_responses()
-
-    if not response:
-        response = "Sorry, I couldn't understand that. Can you rephrase?"
-
+def handle_user_message(user_input, degraded=False):
+    chat_bot = reloader.current()
+    state_data = session.get('state')
+    conversation_state = ConversationState.from_dict(state_data)
+    analysis = batcher.analyze(chat_bot, user_input) if batcher.enabled and not degraded else None
+    response = profiler.profile(chat_bot.respond, user_input, conversation_state, degraded, analysis)
+    if conversation_state.to_dict() != state_data:  # most turns leave the state alone, so nothing is written
+        session['state'] = conversation_state.to_dict()
+    chat_bot.history_of_convo(HISTORY_PATH, f"User: {user_input}\nChatbot: {response}")  # one entry, so exchanges never interleave
     return response
 
 
-from flask import jsonify
-
 @app.route('/message', methods=['POST'])
 def message():
+    started = time.perf_counter()
     try:
         user_input = request.get_json().get('message')  # Correctly get the message from JSON
         if not user_input:
             raise ValueError("Empty message received")
 
-        response = handle_user_message(user_input)
+        with admission.admit() as degraded:
+            response = handle_user_message(user_input, degraded)
         return jsonify({'message': response})
 
+    except Overloaded as e:
+        reply = jsonify({'message': "We're handling a lot of messages right now, please try again in a moment."})
+        return reply, 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         print(f"Error processing message: {e}")
+        metrics.errors_total.inc(stage="request")
         return jsonify({'message': 'Error processing your message'}), 500
+    finally:
+        metrics.request_seconds.observe(time.perf_counter() - started, endpoint="message")
+
+
+@app.before_request
+def start_watcher():
+    if WATCH_INTERVAL > 0:
+        reloader.watch(WATCH_INTERVAL)  # no-op once running in this process
+
+
+def admin_allowed():  # closed unless CHATBOT_ADMIN_TOKEN is set; a reload is too expensive to leave open
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode())
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not admin_allowed():
+        return jsonify({'message': 'Forbidden'}), 403
+    master_pid = os.environ.get("CHATBOT_MASTER_PID")
+    if master_pid:  # a pre-fork worker: the master rebuilds once and restarts every worker on the new models
+        os.kill(int(master_pid), signal.SIGHUP)
+        return jsonify({'reloading': True, 'status': reloader.status}), 202
+    started = reloader.reload()
+    return jsonify({'reloading': started, 'status': reloader.status}), 202 if started else 409
+
+
+@app.route('/admin/status', methods=['GET'])
+def admin_status():
+    if not admin_allowed():
+        return jsonify({'message': 'Forbidden'}), 403
+    return jsonify(dict(reloader.status, admission=admission.stats()))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/', methods=['GET', 'POST'])
 def chat():
@@ -214,14 +265,7 @@ def chat():
         print(f"Received message: {user_message}")
         session['messages'].append((user_message, 'user'))
 
-        chat_bot.set_user_message(user_message)
-        response = "No response generated"  # Default response
-        if chat_bot.tag == "airline":
-            response = chat_bot.airline_tag_response()
-        elif chat_bot.tag == "recommended_airlines":
-            response = chat_bot.recommended_airlines_responses(user_message, chat_bot.conversation_state)
-        else:
-            response = chat_bot.other_tags_responses()
+        response = handle_user_message(user_message)
         print(f"Generated response: {response}")
 
         session['messages'].append((response, 'bot'))
@@ -234,8 +278,9 @@ def chat():
 def end_chat():
     # Clear the session
     session.pop('messages', None)
+    session.pop('state', None)
     print("Learn Git, chat bot")
     return redirect(url_for('chat'))
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    app.run(debug=True, port=5002, threaded=True)
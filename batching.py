@@ -0,0 +1,71 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import metrics
+
+batch_size = metrics.registry.histogram("chatbot_batch_size", "Messages analysed together by the request coalescer.",
+                                        buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+
+class MessageBatcher:  # coalesces concurrent requests so intent prediction and NER run once per batch
+    def __init__(self, max_batch=None, max_wait=None):
+        self.max_batch = max_batch if max_batch is not None else int(os.environ.get("CHATBOT_BATCH_MAX_SIZE", 32))
+        # seconds the first message of a batch waits for company; 0 turns batching off
+        self.max_wait = max_wait if max_wait is not None else float(os.environ.get("CHATBOT_BATCH_MAX_WAIT_MS", 0)) / 1000
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    @property
+    def enabled(self):
+        return self.max_wait > 0 and self.max_batch > 1
+
+    def analyze(self, chat_bot, message):  # blocks until the batch holding this message has been analysed
+        if not self.enabled:
+            return chat_bot.analyze(message)
+        self.ensure_started()
+        future = Future()
+        self.queue.put((chat_bot, message, future))
+        return future.result()
+
+    def ensure_started(self):  # same lazy, fork-aware start as the history writer
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name="message-batcher", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch_size.observe(len(batch))
+            self.analyze_batch(batch)
+
+    def analyze_batch(self, batch):
+        groups = {}  # a reload can swap the bot mid-batch; each request is answered by the bot it started with
+        for chat_bot, message, future in batch:
+            groups.setdefault(id(chat_bot), (chat_bot, []))[1].append((message, future))
+        for chat_bot, items in groups.values():
+            try:
+                analyses = chat_bot.analyze_batch([message for message, _ in items])
+            except Exception as e:
+                metrics.errors_total.inc(stage="batch")
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), analysis in zip(items, analyses):
+                future.set_result(analysis)
@@ -0,0 +1,229 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+from bulk_score import read_messages
+from chatbot import AnalysisCache, ConversationState, build_chat_bot
+
+STAGES = ["intent", "route_extraction", "airline_lookup", "recommendation"]
+
+
+def percentiles(samples):  # nearest-rank p50/p95/p99 in milliseconds
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000
+
+    return {"count": len(ordered), "p50_ms": rank(50), "p95_ms": rank(95), "p99_ms": rank(99),
+            "mean_ms": sum(ordered) / len(ordered) * 1000}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def synthetic_messages(chat_bot, count, seed=42):  # greetings, route requests and follow-ups in a chat-like mix
+    rng = random.Random(seed)
+    patterns = [pattern for intent in chat_bot.intents_data["intents"] for pattern in intent["patterns"]]
+    routes = []
+    for route in chat_bot.route_finder.df["Route"].dropna().astype(str).unique():
+        parts = route.split(" to ")
+        if len(parts) >= 2:
+            routes.append((parts[0].strip(), parts[1].split(" via ")[0].strip()))
+    messages = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4 and routes:
+            origin, destination = rng.choice(routes)
+            messages.append(f"I want to fly from {origin} to {destination}")
+        elif kind < 0.6:
+            messages.append("which one is better")
+        else:
+            messages.append(rng.choice(patterns))
+    return messages
+
+
+def scaled_reviews(reviews_path, factor, directory):  # replicate the review table to test index build cost
+    if factor == 1:
+        return reviews_path
+    df = pd.read_csv(reviews_path)
+    scaled_path = os.path.join(directory, f"airlines_reviews_x{factor}.csv")
+    pd.concat([df] * factor, ignore_index=True).to_csv(scaled_path, index=False)
+    return scaled_path
+
+
+def cold_start(args, reviews_path):
+    started = time.perf_counter()
+    chat_bot = build_chat_bot(args.intents, reviews_path, args.sentiment)
+    built = time.perf_counter()
+    chat_bot.route_finder.nlp  # spaCy loads lazily, so account for it separately
+    loaded = time.perf_counter()
+    return chat_bot, {"build_s": built - started, "nlp_load_s": loaded - built, "total_s": loaded - started}
+
+
+def stage_latencies(chat_bot, messages):  # each stage timed on its own, bypassing the analysis cache
+    samples = {stage: [] for stage in STAGES}
+    for message in messages:
+        started = time.perf_counter()
+        chat_bot.classifier.predict_intent(message)
+        intent_done = time.perf_counter()
+        route = chat_bot.route_finder.find_matched_route(message)
+        route_done = time.perf_counter()
+        _, airlines = chat_bot.route_finder.find_matched_airline(route)
+        airlines_done = time.perf_counter()
+        samples["intent"].append(intent_done - started)
+        samples["route_extraction"].append(route_done - intent_done)
+        samples["airline_lookup"].append(airlines_done - route_done)
+        if airlines:
+            chat_bot.sentiment_store.recommend(route, airlines)
+            samples["recommendation"].append(time.perf_counter() - airlines_done)
+    return {stage: percentiles(values) for stage, values in samples.items()}
+
+
+def run_concurrent(send, messages, concurrency):  # send(message, session_index) from `concurrency` threads
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        session_index = index % concurrency
+        started = time.perf_counter()
+        send(messages[index], session_index)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(len(messages))))
+    wall = time.perf_counter() - started
+    return dict(percentiles(latencies), concurrency=concurrency, messages_per_s=len(messages) / wall if wall else None)
+
+
+def direct_sender(chat_bot, concurrency):
+    states = [ConversationState() for _ in range(concurrency)]
+
+    def send(message, session_index):
+        chat_bot.respond(message, states[session_index])
+
+    return send
+
+
+def http_sender(url, concurrency):  # one cookie jar per simulated user, so sessions stay separate
+    openers = [urllib.request.build_opener(urllib.request.HTTPCookieProcessor()) for _ in range(concurrency)]
+
+    def send(message, session_index):
+        request = urllib.request.Request(url, data=json.dumps({"message": message}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        with openers[session_index].open(request) as response:
+            response.read()
+
+    return send
+
+
+def flask_sender(concurrency):  # in-process Flask test clients against app.py's /message
+    import app as flask_app
+    clients = [flask_app.app.test_client() for _ in range(concurrency)]
+
+    def send(message, session_index):
+        clients[session_index].post("/message", json={"message": message})
+
+    return send
+
+
+def compare(result, baseline_path):  # print p95 changes against an earlier run
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    for scale, run in result["runs"].items():
+        previous = baseline.get("runs", {}).get(scale)
+        if not previous:
+            continue
+        for stage, stats in run["stages"].items():
+            before = previous["stages"].get(stage, {}).get("p95_ms")
+            if before and stats.get("p95_ms"):
+                print(f"x{scale} {stage}: p95 {before:.3f} -> {stats['p95_ms']:.3f} ms ({stats['p95_ms'] / before:.2f}x)")
+
+
+def run_scale(args, reviews_path, concurrency_levels):  # runs in a fresh process, see main()
+    chat_bot, cold = cold_start(args, reviews_path)
+    if args.no_cache:
+        chat_bot.analysis_cache = AnalysisCache(max_size=0)
+    messages = list(read_messages(args.transcript)) if os.path.exists(args.transcript) else []
+    messages += synthetic_messages(chat_bot, args.synthetic, args.seed)
+
+    run = {"reviews": len(chat_bot.route_finder.df), "messages": len(messages), "cold_start": cold,
+           "stages": stage_latencies(chat_bot, messages), "direct": []}
+    for concurrency in concurrency_levels:
+        chat_bot.analysis_cache.clear()  # every level starts cold, so messages/sec compare like for like
+        before = chat_bot.analysis_cache.stats()
+        direct = run_concurrent(direct_sender(chat_bot, concurrency), messages, concurrency)
+        after = chat_bot.analysis_cache.stats()
+        direct["analysis_cache"] = {"hits": after["hits"] - before["hits"], "misses": after["misses"] - before["misses"]}
+        run["direct"].append(direct)
+    run["peak_rss_mb"] = peak_rss_mb()  # this process only
+    return run, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat pipeline latency and throughput.")
+    parser.add_argument("--transcript", default="./conversation_history.txt", help="transcript to replay")
+    parser.add_argument("--synthetic", type=int, default=500, help="synthetic messages added to the replay")
+    parser.add_argument("--intents", default="./intents.json")
+    parser.add_argument("--reviews", default="./airlines_reviews.csv")
+    parser.add_argument("--sentiment", default="./analyzed_sentiment_result.csv")
+    parser.add_argument("--scales", default="1", help="comma-separated review dataset multipliers, e.g. 1,10,100")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated thread counts")
+    parser.add_argument("--http", choices=["none", "flask", "url"], default="none",
+                        help="also drive /message through Flask's test client or a running server")
+    parser.add_argument("--url", default="http://127.0.0.1:5002/message")
+    parser.add_argument("--no-cache", action="store_true", help="disable the analysis cache for end-to-end runs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="./benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare p95 latencies against")
+    args = parser.parse_args()
+
+    concurrency_levels = [int(value) for value in args.concurrency.split(",")]
+    result = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(), "args": vars(args)},
+        "runs": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in (int(value) for value in args.scales.split(",")):
+            # A fresh interpreter per scale: spaCy, the loaded models and peak RSS would otherwise carry over
+            # from the previous scale and hide its cold start and memory cost.
+            reviews_path = scaled_reviews(args.reviews, scale, directory)  # here, so its memory is not the bot's
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                run, messages = pool.submit(run_scale, args, reviews_path, concurrency_levels).result()
+            result["runs"][str(scale)] = run
+            print(f"x{scale}: {run['reviews']} reviews, cold start {run['cold_start']['total_s']:.2f}s")
+
+    if args.http != "none":  # the server owns its own data, so HTTP runs are not scaled
+        result["http"] = []
+        for concurrency in concurrency_levels:
+            send = http_sender(args.url, concurrency) if args.http == "url" else flask_sender(concurrency)
+            result["http"].append(run_concurrent(send, messages, concurrency))
+
+    result["peak_rss_mb"] = peak_rss_mb()  # the driver process; per-scale figures are under "runs"
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
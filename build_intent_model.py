@@ -0,0 +1,30 @@
+import argparse
+from chatbot import IntentClassifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the intent model and save it as a versioned artifact.")
+    parser.add_argument("--intents", default="./intents.json", help="path to the intents file")
+    parser.add_argument("--output", default="./models/intent_model.joblib", help="where to write the artifact")
+    parser.add_argument("--compact-output", default="./models/intent_model.npz",
+                        help="where to write the NumPy-only inference model ('' to skip)")
+    parser.add_argument("--force", action="store_true", help="retrain even if the artifact is up to date")
+    parser.add_argument("--search", choices=IntentClassifier.search_modes, default="grid",
+                        help="hyperparameter search: exhaustive grid, successive halving or randomized")
+    parser.add_argument("--iterations", type=int, default=10, help="candidates sampled by --search random")
+    parser.add_argument("--cv", type=int, default=6, help="cross-validation folds")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel search jobs (-1 uses every core)")
+    args = parser.parse_args()
+
+    # trains and saves only when the artifacts are stale (or with --force); the live files are replaced atomically,
+    # so a worker booting meanwhile still loads the previous model
+    classifier = IntentClassifier(args.intents, model_path=args.output, compact_path=args.compact_output or None,
+                                  search=args.search, n_jobs=args.jobs, cv=args.cv, search_iterations=args.iterations,
+                                  force=args.force)
+    print(f"Intent model {classifier.version[:12]} ready at {args.output}")
+    if args.compact_output:
+        print(f"Compact inference model ready at {args.compact_output}")
+
+
+if __name__ == "__main__":
+    main()
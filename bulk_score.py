@@ -0,0 +1,91 @@
+import argparse
+import csv
+import json
+from itertools import islice
+from chatbot import IntentClassifier, ProcessingData, RouteFinder
+
+
+def read_messages(path, user_prefix="User:", bot_prefix="Chatbot:"):  # stream user messages, skipping bot replies
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(bot_prefix):
+                continue
+            if line.startswith(user_prefix):
+                line = line[len(user_prefix):].strip()
+            if line:
+                yield line
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ResultWriter:
+    fields = ["message", "tag", "route", "airlines"]
+
+    def __init__(self, path, output_format):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.output_format = output_format
+        if output_format == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fields)
+            self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.output_format == "csv":
+                self.writer.writerow(dict(row, airlines="; ".join(row["airlines"])))
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()  # results land on disk chunk by chunk, so a long run can be inspected or resumed
+
+    def close(self):
+        self.file.close()
+
+
+def score_messages(classifier, route_finder, messages, chunk_size=1000, batch_size=256, n_process=1):
+    routed = route_finder.iter_matched_routes(messages, batch_size=batch_size, n_process=n_process)
+    for chunk in chunked(routed, chunk_size):
+        tags = classifier.predict_intents([message for message, _ in chunk])
+        rows = []
+        for (message, route), tag in zip(chunk, tags):
+            _, airlines = route_finder.find_matched_airline(route)
+            rows.append({"message": message, "tag": str(tag), "route": route, "airlines": airlines})
+        yield rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score intents and routes for every user message in a transcript.")
+    parser.add_argument("input", help="transcript file, one message per line (e.g. conversation_history.txt)")
+    parser.add_argument("output", help="where to write results, .csv or .jsonl")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="output format (default: from the output extension)")
+    parser.add_argument("--intents", default="./intents.json")
+    parser.add_argument("--reviews", default="./airlines_reviews.csv")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="messages per vectorized intent prediction")
+    parser.add_argument("--batch-size", type=int, default=256, help="spaCy nlp.pipe batch size")
+    parser.add_argument("--n-process", type=int, default=1, help="spaCy worker processes (-1 for all cores)")
+    args = parser.parse_args()
+
+    output_format = args.format or ("jsonl" if args.output.endswith(".jsonl") else "csv")
+    classifier = IntentClassifier(args.intents)
+    route_finder = RouteFinder(ProcessingData(args.reviews), ["Route", "Airline"])
+
+    writer = ResultWriter(args.output, output_format)
+    scored = 0
+    try:
+        for rows in score_messages(classifier, route_finder, read_messages(args.input),
+                                   args.chunk_size, args.batch_size, args.n_process):
+            writer.write(rows)
+            scored += len(rows)
+            print(f"Scored {scored} messages")
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,123 @@
-import spacy
-from spacy.pipeline import EntityRuler
-from spacy.language import Language
 import random
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import os
+import hashlib
+import threading
+import time
+from collections import namedtuple, OrderedDict
 import re
-import pandas as pd
-from sklearn.model_selection import GridSearchCV
-from sklearn.pipeline import Pipeline
+from intent_model import CompactIntentModel
+import metrics
+from history import history_writer
+from gazetteer import Gazetteer, ROUTE_CONNECTORS, normalize
+
+
+IATA_CODE_PATTERN = re.compile(r'\b[A-Z]{3}\b')
+ALIASES_PATH = "./airport_aliases.json"  # city/airport names -> IATA codes, see `gazetteer.py`
+
+
+def route_tokens(text):  # normalize a route or message into lowercase, accent-free location tokens
+    return [token for token in normalize(text).split() if token not in ROUTE_CONNECTORS]
+
+
+CATEGORICAL_COLUMNS = ["Airline", "Route"]  # low-cardinality strings, dictionary-encoded in memory and on disk
+
+
+def columnar_path(path):  # airlines_reviews.csv -> airlines_reviews.parquet, written by `convert_data.py`
+    return f"{os.path.splitext(path)[0]}.parquet"
+
+
+def read_table(path, columns=None):  # prefer an up-to-date Parquet copy of a CSV and read only the needed columns
+    import pandas as pd  # imported here, like spaCy below, so an intent-only process never loads it
+    parquet_path = columnar_path(path)
+    if os.path.exists(parquet_path) and (not os.path.exists(path) or os.path.getmtime(parquet_path) >= os.path.getmtime(path)):
+        return pd.read_parquet(parquet_path, columns=columns)  # decoded into a private DataFrame in each process
+    categorical = {column: "category" for column in CATEGORICAL_COLUMNS if columns is None or column in columns}
+    return pd.read_csv(path, usecols=columns, dtype=categorical)
+
+
+def location_patterns(aliases_path=ALIASES_PATH):  # entity ruler patterns
+    gazetteer = Gazetteer.from_file(aliases_path)
+    patterns = [{"label": "GPE", "pattern": "Adelaide"}]
+    for alias in gazetteer.names:  # every alias is a place, whatever NER thinks
+        if alias in gazetteer.ambiguous:  # "the flight was nice" is not Nice, so only the capitalized form counts
+            pattern = [{"ORTH": word.title()} for word in alias.split()]
+        else:
+            pattern = [{"LOWER": word} for word in alias.split()]
+        patterns.append({"label": "GPE", "pattern": pattern})
+    return patterns
+
+
+def file_version(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class NLPProvider:  # one lazily loaded spaCy pipeline shared by every component in the process
+    unused_components = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+    def __init__(self, model_name="en_core_web_sm", aliases_path=ALIASES_PATH):
+        self.model_name = model_name
+        self.aliases_path = aliases_path
+        self.lock = threading.Lock()
+        self.nlp = None
+        self.aliases_version = None  # alias file the current pipeline's ruler was built from
+
+    def get(self):
+        if self.nlp is None:
+            with self.lock:
+                if self.nlp is None:
+                    self.nlp = self.load()
+        return self.nlp
+
+    def load(self):
+        import spacy  # several seconds of imports, paid only by processes that extract routes
+        self.aliases_version = file_version(self.aliases_path)
+        nlp = spacy.load(self.model_name, exclude=self.unused_components)  # only NER reads GPE entities
+        ruler = nlp.add_pipe("entity_ruler", name="custom_entity_ruler", before="ner")
+        ruler.add_patterns(location_patterns(self.aliases_path))
+        return nlp
+
+    def refresh(self):  # rebuild the pipeline off to the side when the alias table changed, then swap it in
+        if self.nlp is None or file_version(self.aliases_path) == self.aliases_version:
+            return
+        with self.lock:
+            if file_version(self.aliases_path) != self.aliases_version:
+                self.nlp = self.load()
+
+
+nlp_provider = NLPProvider()
 
 
 class IntentClassifier:
-    def __init__(self, intents_path):
+    parameters = {
+        'tfidf__ngram_range': [(1, 1), (1, 2)],
+        'tfidf__max_features': [None, 500, 1000],
+        'clf__C': [0.1, 1, 10, 100]
+    }  # identify the parameters to be tuned then use grid search to find the best model
+
+    search_modes = ("grid", "halving", "random")
+
+    def __init__(self, intents_path, model_path="./models/intent_model.joblib",
+                 compact_path="./models/intent_model.npz", search="grid", n_jobs=-1, cv=6, search_iterations=10,
+                 force=False):
+        if search not in self.search_modes:
+            raise ValueError(f"Unknown search mode: {search}")
         self.intents_path = intents_path
-        intents_data = self.load_model()
-        self.model = self.train_model(intents_data)
-        self.nlp = spacy.load("en_core_web_sm")
-        self.add_pipeline()
+        self.model_path = model_path
+        self.compact_path = compact_path  # NumPy-only export; when fresh, sklearn is never imported
+        self.search = search  # how train_model explores `parameters`; not part of the model key
+        self.n_jobs = n_jobs
+        self.cv = cv
+        self.search_iterations = search_iterations  # candidates sampled in "random" mode
+        self.model = self.load_or_train(force=force)
+
+    @property
+    def nlp(self):
+        return nlp_provider.get()
     
     def load_model(self):  # this method is used to load intents
         try:
@@ -30,214 +130,551 @@ class IntentClassifier:
             print("Intents file not found.")
             return []
 
+    def model_key(self):  # content hash of the intents file and the search grid, used to version the artifact
+        digest = hashlib.sha256()
+        with open(self.intents_path, "rb") as f:
+            digest.update(f.read())
+        digest.update(json.dumps(self.parameters, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def load_or_train(self, force=False):  # reuse the saved model while intents and grid are unchanged
+        self.version = self.model_key()
+        if not force:
+            compact_model = CompactIntentModel.load_if_fresh(self.compact_path, self.version)
+            if compact_model is not None:
+                return compact_model
+        model = None
+        if not force and self.model_path and os.path.exists(self.model_path):
+            import joblib
+            try:
+                artifact = joblib.load(self.model_path)
+                if artifact.get("key") == self.version:
+                    model = artifact["model"]
+                else:
+                    print("Intent model artifact is stale, retraining.")
+            except Exception as e:
+                print(f"Error loading intent model artifact: {e}")
+        if model is None:
+            model = self.train_model(self.load_model())
+            if self.model_path:
+                self.save_model(model)
+        if self.compact_path:
+            compact_model = CompactIntentModel.from_pipeline(model, self.version)
+            patterns = [pattern for intent in self.load_model()["intents"] for pattern in intent["patterns"]]
+            if list(compact_model.predict(patterns)) != list(model.predict(patterns)):  # never serve a diverging export
+                print("Compact intent model disagrees with the trained pipeline, using the pipeline.")
+                return model
+            compact_model.save(self.compact_path)
+            return compact_model
+        return model
+
+    def save_model(self, model):
+        import joblib
+        os.makedirs(os.path.dirname(self.model_path) or ".", exist_ok=True)
+        tmp_path = f"{self.model_path}.{os.getpid()}.tmp"
+        joblib.dump({"key": self.version, "model": model}, tmp_path)
+        os.replace(tmp_path, self.model_path)  # atomic, so concurrently booting workers never read a partial file
+
     def train_model(self, intents_data):  # train model
+        import shutil
+        import tempfile
+        from sklearn.feature_extraction.text import TfidfVectorizer  # imported here so inference never pays for sklearn
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
+
         tags = []
         patterns = []
         for intent in intents_data["intents"]:
             for pattern in intent["patterns"]:
                 patterns.append(pattern)
                 tags.append(intent['tag'])
-        
-        pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer()),
-            ('clf', LogisticRegression(random_state=42))  # using Logistic Regression to classify patterns and tags
-        ])
-
-        parameters = {
-            'tfidf__ngram_range': [(1, 1), (1, 2)],
-            'tfidf__max_features': [None, 500, 1000],
-            'clf__C': [0.1, 1, 10, 100]
-        }  # identify the parameters to be tuned then use grid search to find the best model
-
-        grid_search = GridSearchCV(pipeline, parameters, cv=6, n_jobs=2)
-        grid_search.fit(patterns, tags)
-        return grid_search.best_estimator_
-    
-    def predict_intent(self, user_message):
-        vectorized_message = self.model['tfidf'].transform([user_message])
-        predicted_tag = self.model['clf'].predict(vectorized_message)[0]
-        return predicted_tag
-    
-    @spacy.Language.factory("custom_entity_ruler")
-    def create_custom_entity_ruler(nlp, name):
-        ruler = EntityRuler(nlp)
-        patterns = [{"label": "GPE", "pattern": "Adelaide"}]
-        ruler.add_patterns(patterns)
-        return ruler
 
-    def add_pipeline(self):
-        self.nlp.add_pipe("custom_entity_ruler", before="ner")
+        # The TF-IDF fitted on a fold depends only on the tfidf__ parameters, so the cache lets every clf__C
+        # candidate reuse it instead of refitting the vectorizer.
+        cache_dir = tempfile.mkdtemp(prefix="intent-search-")
+        try:
+            pipeline = Pipeline([
+                ('tfidf', TfidfVectorizer()),
+                ('clf', LogisticRegression(random_state=42))  # using Logistic Regression to classify patterns and tags
+            ], memory=cache_dir)
+            search = self.make_search(pipeline, len(patterns), len(set(tags)))
+            started = time.perf_counter()
+            search.fit(patterns, tags)
+            elapsed = time.perf_counter() - started
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        candidates = len(search.cv_results_["params"])
+        print(f"Intent model search ({self.search}): {candidates} candidates x {self.cv} folds in {elapsed:.2f}s, "
+              f"best CV accuracy {search.best_score_:.3f} with {search.best_params_}")
+        return search.best_estimator_.set_params(memory=None)  # the cache directory is gone
 
+    def make_search(self, pipeline, n_samples, n_classes):
+        if self.search == "halving":
+            from sklearn.experimental import enable_halving_search_cv  # noqa: F401, registers HalvingGridSearchCV
+            from sklearn.model_selection import HalvingGridSearchCV
+            # every class needs a few samples in each fold of the first, smallest round
+            min_resources = min(n_samples, n_classes * self.cv * 2)
+            return HalvingGridSearchCV(pipeline, self.parameters, cv=self.cv, factor=3, min_resources=min_resources,
+                                       n_jobs=self.n_jobs, random_state=42)
+        if self.search == "random":
+            from scipy.stats import loguniform
+            from sklearn.model_selection import RandomizedSearchCV
+            c_values = self.parameters['clf__C']
+            distributions = dict(self.parameters, clf__C=loguniform(min(c_values), max(c_values)))
+            return RandomizedSearchCV(pipeline, distributions, n_iter=self.search_iterations, cv=self.cv,
+                                      n_jobs=self.n_jobs, random_state=42)
+        from sklearn.model_selection import GridSearchCV
+        return GridSearchCV(pipeline, self.parameters, cv=self.cv, n_jobs=self.n_jobs)
+
+    def predict_intent(self, user_message):  # the sklearn Pipeline and CompactIntentModel share predict()
+        predicted_tag = self.model.predict([user_message])[0]
+        return predicted_tag
+
+    def predict_intents(self, user_messages):  # one vectorized transform/predict for a whole batch
+        if not user_messages:
+            return []
+        return list(self.model.predict(user_messages))
+    
 
 class ProcessingData:
     def __init__(self, air_line_file_path):
         self.air_line_file_path = air_line_file_path
     
-    def handle_data(self, removed_columns):
-        self.df = pd.read_csv(self.air_line_file_path)
+    def handle_data(self, removed_columns, columns=None):
+        self.df = read_table(self.air_line_file_path, columns)
         self.df = self.df.drop(removed_columns, errors='ignore')
         return self.df
 
 
+class RouteIndex:  # token -> routes containing it, so every requested location must be on the same route
+    def __init__(self, pairs, tokenize):
+        self.routes = {}  # token (IATA code, city name, "via" hop) -> route keys
+        self.route_airlines = {}  # route key -> airlines flying it
+        for route, airline in pairs:
+            tokens = tokenize(route)
+            if not tokens:
+                continue
+            route_key = " ".join(tokens)
+            self.route_airlines.setdefault(route_key, set()).add(airline)
+            for token in tokens:
+                self.routes.setdefault(token, set()).add(route_key)
+
+    def airlines(self, tokens):
+        candidates = sorted((self.routes.get(token, set()) for token in set(tokens)), key=len)
+        if not candidates:
+            return []
+        matched_routes = set(candidates[0]).intersection(*candidates[1:])  # start from the rarest token
+        matched_airlines = set()
+        for route_key in matched_routes:
+            matched_airlines.update(self.route_airlines[route_key])
+        return sorted(matched_airlines)
+
+
 class RouteFinder:
-    def __init__(self, data_loader, removed_columns):
+    def __init__(self, data_loader, removed_columns, aliases_path=ALIASES_PATH):
         self.data_loader = data_loader
-        self.nlp = spacy.load("en_core_web_sm")
-        self.df = self.data_loader.handle_data(removed_columns)
+        self.df = self.data_loader.handle_data(removed_columns, columns=["Route", "Airline"])
+        self.gazetteer = Gazetteer.from_file(aliases_path).add_routes(self.df["Route"].dropna().unique())
+        self.route_index = self.build_route_index()
+        self.version = time.time_ns()  # identifies this index build, so cached lookups can tell it was rebuilt
+
+    @property
+    def nlp(self):
+        return nlp_provider.get()
+
+    def build_route_index(self):
+        pairs = self.df[["Route", "Airline"]].dropna().drop_duplicates()
+        return RouteIndex(zip(pairs["Route"], pairs["Airline"]), self.route_tokens)
+
+    def route_tokens(self, route):  # "Phuket to Singapore" and "HKT to SIN" both become ["hkt", "sin"]
+        return self.gazetteer.tokens(route)
+
+    def gazetteer_route(self, message):  # one Aho-Corasick pass over the message, no NER
+        return self.gazetteer.route_text(self.gazetteer.locations(message))
 
     def find_matched_route(self, message):
-        airport_codes = re.findall(r'\b[A-Z]{3}\b', message)  # using regex to find the route that is performed by airport codes
+        airport_codes = IATA_CODE_PATTERN.findall(message)  # using regex to find the route that is performed by airport codes
         if airport_codes:
-            return " to ".join(airport_codes)
+            return " to ".join(airport_codes)  # resolved without touching the spaCy pipeline
+        route = self.gazetteer_route(message)
+        if route:
+            return route
         doc = self.nlp(message)
         locations = [ent.text for ent in doc.ents if ent.label_ == "GPE"]  # otherwise, using NLP to recognize GPE 
         return " to ".join(locations)
 
+    def iter_matched_routes(self, messages, batch_size=256, n_process=1):  # yields (message, route) in input order
+        def with_context():
+            for message in messages:
+                airport_codes = IATA_CODE_PATTERN.findall(message)
+                route = " to ".join(airport_codes) if airport_codes else self.gazetteer_route(message)
+                if route:
+                    yield "", (message, route)  # an empty doc keeps the order at no NER cost
+                else:
+                    yield message, (message, None)
+
+        docs = self.nlp.pipe(with_context(), as_tuples=True, batch_size=batch_size, n_process=n_process)
+        for doc, (message, route) in docs:
+            if route is None:
+                route = " to ".join(ent.text for ent in doc.ents if ent.label_ == "GPE")
+            yield message, route
+
     def find_matched_airline(self, route):
         if not route:
             return "Route is not determined.", []
-        matched_airlines = set()
-        for _, row in self.df.iterrows():
-            if all(location.lower() in row["Route"].lower() for location in route.split()):
-                matched_airlines.add(row["Airline"])
+        tokens = self.route_tokens(route)
+        if not tokens:
+            return route, []
+        return route, self.route_index.airlines(tokens)
 
-        return route, list(matched_airlines)
 
+class SentimentSnapshot:  # everything one sentiment load produces, published with a single assignment
+    def __init__(self, rankings, route_keys, global_mean):
+        self.rankings = rankings  # route key -> ranking
+        self.route_keys = route_keys  # token -> route keys containing it
+        self.global_mean = global_mean
+        self.merged_rankings = {}  # rankings for requested routes, filled only from this snapshot's data
 
-class ChatBot:
-    def __init__(self, classifier, route_finder, data_processor, sentiment_analyse_path):
+
+class SentimentStore:
+    def __init__(self, sentiment_analyse_path, prior_weight=5, max_cached_routes=10000, tokenize=route_tokens):
+        self.sentiment_analyse_path = sentiment_analyse_path
+        self.tokenize = tokenize  # must match the route finder's tokens so both sides agree on route keys
+        # per-(Route, Airline) count/sum table kept up to date by `sentiment_analyze.py`, much smaller than the rows
+        self.aggregates_path = f"{os.path.splitext(sentiment_analyse_path)[0]}_aggregates.csv"
+        self.max_cached_routes = max_cached_routes
+        self.prior_weight = prior_weight  # number of "average" reviews blended into every airline's score
+        self.auto_refresh = True  # check the files on every recommendation; hot_reload turns this off
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.snapshot = SentimentSnapshot({}, {}, 0.0)
+        self.refresh()
+
+    def file_version(self):
+        mtimes = []
+        for path in (self.sentiment_analyse_path, columnar_path(self.sentiment_analyse_path), self.aggregates_path):
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def refresh(self):  # reload the sentiment files only when they have changed on disk
+        mtime = self.file_version()
+        if mtime == (None, None, None):
+            print("Sentiment file not found.")
+            return
+        if mtime == self.mtime:
+            return
+        with self.lock:
+            if mtime != self.mtime:
+                with metrics.timed("sentiment_reload"):
+                    self.load(mtime)
+
+    def read_aggregates(self, mtime):
+        result_mtime = max((value for value in mtime[:2] if value is not None), default=None)
+        aggregates_mtime = mtime[2]
+        if aggregates_mtime is not None and (result_mtime is None or aggregates_mtime >= result_mtime):
+            import pandas as pd
+            return pd.read_csv(self.aggregates_path, usecols=["Route", "Airline", "count", "sum"]).dropna()
+        data = read_table(self.sentiment_analyse_path, columns=["Airline", "Route", "sentiment_score"]).dropna()
+        return data.groupby(["Route", "Airline"], observed=True)["sentiment_score"].agg(["count", "sum"]).reset_index()
+
+    def load(self, mtime):
+        data = self.read_aggregates(mtime)
+        data["route_key"] = [" ".join(self.tokenize(route)) for route in data["Route"]]
+        aggregates = data.groupby(["route_key", "Airline"], observed=True)[["count", "sum"]].sum().reset_index()
+        total_count = aggregates["count"].sum()
+        global_mean = float(aggregates["sum"].sum() / total_count) if total_count else 0.0
+
+        rankings = {}
+        for route_key, airline, count, total in aggregates.itertuples(index=False):
+            rankings.setdefault(route_key, []).append((airline, int(count), float(total)))
+        route_keys = {}  # token -> route keys containing it, to answer partial routes without scanning rows
+        for route_key in rankings:
+            for token in route_key.split():
+                route_keys.setdefault(token, set()).add(route_key)
+
+        rankings = {route_key: self.rank(rows, global_mean) for route_key, rows in rankings.items()}
+        self.snapshot = SentimentSnapshot(rankings, route_keys, global_mean)  # readers see the old or the new, never a mix
+        self.mtime = mtime
+
+    def rank(self, rows, global_mean):  # rows of (airline, count, sum) -> [(airline, count, mean, score)] sorted best first
+        ranked = []
+        for airline, count, total in rows:
+            score = (total + self.prior_weight * global_mean) / (count + self.prior_weight)
+            ranked.append((airline, count, total / count, score))
+        return sorted(ranked, key=lambda row: (-row[3], row[0]))
+
+    def route_ranking(self, route):  # ranking over every stored route that contains all the requested locations
+        snapshot = self.snapshot  # read once, so a concurrent reload cannot mix two versions into one lookup
+        tokens = self.tokenize(route)
+        route_key = " ".join(tokens)
+        ranking = snapshot.merged_rankings.get(route_key)
+        if ranking is None:
+            candidates = sorted((snapshot.route_keys.get(token, set()) for token in set(tokens)), key=len)
+            matched_keys = set(candidates[0]).intersection(*candidates[1:]) if candidates else set()
+            if len(matched_keys) == 1:
+                ranking = snapshot.rankings[matched_keys.pop()]
+            else:
+                totals = {}
+                for key in matched_keys:
+                    for airline, count, mean, _ in snapshot.rankings[key]:
+                        airline_count, airline_sum = totals.get(airline, (0, 0.0))
+                        totals[airline] = (airline_count + count, airline_sum + mean * count)
+                ranking = self.rank(((airline, count, total) for airline, (count, total) in totals.items()),
+                                    snapshot.global_mean)
+            if len(snapshot.merged_rankings) >= self.max_cached_routes:
+                snapshot.merged_rankings.clear()
+            snapshot.merged_rankings[route_key] = ranking
+        return ranking
+
+    def recommend(self, route, airlines=None, top_k=3):
+        if self.auto_refresh:
+            self.refresh()
+        ranking = self.route_ranking(route)
+        if airlines is not None:
+            airlines = set(airlines)
+            ranking = [row for row in ranking if row[0] in airlines]
+        return ranking[:top_k]
+
+
+MessageAnalysis = namedtuple("MessageAnalysis", ["tag", "route", "airlines"])
+
+
+class AnalysisCache:  # bounded LRU of message -> MessageAnalysis, emptied whenever the models behind it change
+    def __init__(self, max_size=10000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl  # seconds an entry stays valid, None keeps entries until evicted
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(message):  # case is kept: IATA codes and NER both depend on it
+        return " ".join(message.split())
+
+    def check_version(self, version):
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    def get(self, message, version):
+        key = self.key(message)
+        with self.lock:
+            self.check_version(version)
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, message, version, analysis):
+        if self.max_size <= 0:
+            return
+        key = self.key(message)
+        with self.lock:
+            self.check_version(version)
+            self.entries[key] = (analysis, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "max_size": self.max_size}
+
+
+class ConversationState:  # the only per-user data, kept small so it can be stored by session id
+    def __init__(self, route=None, airlines=None, last_tag=None):
+        self.route = route
+        self.airlines = airlines
+        self.last_tag = last_tag
+
+    def to_dict(self):
+        return {"route": self.route, "airlines": self.airlines, "last_tag": self.last_tag}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**(data or {}))
+
+
+class ChatBot:  # shared and read-only once built; everything per-user lives in ConversationState
+    route_format_requests = [
+        "Can you specify your request?",
+        "I didn't catch that. Could you restate your route?",
+        "I need more details please.",
+        "Could you tell me where you're leaving?",
+        "Hmm, could you clarify your route?",
+        "Please provide me more information.",
+        "Help me out here. Where are you traveling?",
+        "I need a bit more info to help."
+    ]
+    response_templates = [
+        "You have multiple options: {}. Which would you prefer?",
+        "You can choose among these airlines for your route: {}.",
+        "For your journey, consider these airlines: {}.",
+        "Several airlines are available for your route, including {}."
+    ]
+    recommended_airlines_response_templates = [
+        "Considering all factors, {best_airline} would be a great choice for your trip!",
+        "Based on our analysis, {best_airline} is the top recommendation for your route.",
+        "You might enjoy traveling with {best_airline}, as it's highly rated for this route.",
+        "For a pleasant journey, I'd recommend going with {best_airline} for your route."
+    ]
+
+    def __init__(self, classifier, route_finder, data_processor, sentiment_analyse_path, analysis_cache=None):
         self.classifier = classifier
         self.route_finder = route_finder
         self.data_processor = data_processor
         self.sentiment_analyse_path = sentiment_analyse_path
-        self.conversation_state = {
-            "route": None,
-            "airlines": None,
-            "last_tag": None
-        }
-        self.response_generated = False
-        self.chat_response = ""
-
+        self.sentiment_store = SentimentStore(sentiment_analyse_path, tokenize=route_finder.route_tokens)
         self.intents_data = classifier.load_model()
-        self.tag = None
-        self.route = None
-    
-    def set_user_message(self, user_message):
-        self.user_message = user_message
-        self.tag = self.classifier.predict_intent(user_message)
-        self.route = self.route_finder.find_matched_route(user_message)
-        _, self.matched_airlines = self.route_finder.find_matched_airline(self.route)
-        self.route_format_requests = [
-            "Can you specify your request?",
-            "I didn't catch that. Could you restate your route?",
-            "I need more details please.",
-            "Could you tell me where you're leaving?",
-            "Hmm, could you clarify your route?",
-            "Please provide me more information.",
-            "Help me out here. Where are you traveling?",
-            "I need a bit more info to help."
-        ]
-        self.response_templates = [
-            "You have multiple options: {}. Which would you prefer?",
-            "You can choose among these airlines for your route: {}.",
-            "For your journey, consider these airlines: {}.",
-            "Several airlines are available for your route, including {}."
-        ]
-        self.recommended_airlines_response_templates = [
-            "Considering all factors, {best_airline} would be a great choice for your trip!",
-            "Based on our analysis, {best_airline} is the top recommendation for your route.",
-            "You might enjoy traveling with {best_airline}, as it's highly rated for this route.",
-            "For a pleasant journey, I'd recommend going with {best_airline} for your route."
-        ]
-
-    def airline_tag_response(self):
-        if self.tag == "airline":
-            self.route = self.route_finder.find_matched_route(self.user_message)  # Find the route based on user message
-            _, self.matched_airlines = self.route_finder.find_matched_airline(self.route)  # Find airlines for the route
-
-            if self.matched_airlines:
-                self.conversation_state.update({
-                    "route": self.route,
-                    "airlines": self.matched_airlines,
-                    "last_tag": self.tag
-                })
-                
-                if len(self.matched_airlines) > 1:
-                    self.airlines_list = ", ".join(self.matched_airlines[:-1]) + ", or " + self.matched_airlines[-1]
-                    self.chat_response = random.choice(self.response_templates).format(self.airlines_list)
-                else:
-                    self.chat_response = f"The only airline available that i can provide for your route is {self.matched_airlines[0]}."
-                return self.chat_response
-            else:
-                self.chat_response = random.choice(self.route_format_requests)
-                return self.chat_response
-        return "I don't have enough information to respond to that right now."
-
-    def recommended_airlines_responses(self, user_message, conversation_state):
-        self.route = conversation_state["route"]
-        self.matched_airlines = conversation_state["airlines"]
-
-        if not self.route or not self.matched_airlines:
-            self.route = self.route_finder.find_matched_route(user_message)
-            _, self.matched_airlines = self.route_finder.find_matched_airline(self.route)
-            conversation_state["route"] = self.route
-            conversation_state["airlines"] = self.matched_airlines
-
-        if self.matched_airlines:
-            data = pd.read_csv(self.sentiment_analyse_path)
-            matched_route = data[data['Route'].str.contains(self.route, case=False) & data['Airline'].isin(self.matched_airlines)]
-            if not matched_route.empty:
-                best_airline = matched_route.loc[matched_route['sentiment_score'].idxmax()]['Airline']
-                self.chat_response = random.choice(self.recommended_airlines_response_templates).format(best_airline=best_airline)
-                return self.chat_response
+        self.analysis_cache = analysis_cache if analysis_cache is not None else AnalysisCache()
+
+    def analysis_version(self):
+        return self.classifier.version, self.route_finder.version
+
+    def analyze(self, user_message):  # intent, route and airlines are computed once per message
+        version = self.analysis_version()
+        analysis = self.analysis_cache.get(user_message, version)
+        if analysis is not None:
+            metrics.analysis_cache_total.inc(result="hit")
+            return analysis
+        metrics.analysis_cache_total.inc(result="miss")
+        with metrics.timed("intent"):
+            tag = self.classifier.predict_intent(user_message)
+        with metrics.timed("route_extraction"):
+            route = self.route_finder.find_matched_route(user_message)
+        with metrics.timed("airline_lookup"):
+            _, airlines = self.route_finder.find_matched_airline(route)
+        analysis = MessageAnalysis(tag, route, airlines)
+        self.analysis_cache.put(user_message, version, analysis)
+        return analysis
+
+    def analyze_batch(self, user_messages):  # same results as analyze(), with one vectorized predict and one nlp.pipe
+        version = self.analysis_version()
+        analyses = [self.analysis_cache.get(message, version) for message in user_messages]
+        missing = list(dict.fromkeys(message for message, analysis in zip(user_messages, analyses) if analysis is None))
+        metrics.analysis_cache_total.inc(len(user_messages) - analyses.count(None), result="hit")
+        metrics.analysis_cache_total.inc(analyses.count(None), result="miss")
+        if missing:
+            with metrics.timed("intent"):
+                tags = self.classifier.predict_intents(missing)
+            with metrics.timed("route_extraction"):
+                routes = [route for _, route in self.route_finder.iter_matched_routes(missing, batch_size=len(missing))]
+            computed = {}
+            with metrics.timed("airline_lookup"):
+                for message, tag, route in zip(missing, tags, routes):
+                    _, airlines = self.route_finder.find_matched_airline(route)
+                    computed[message] = MessageAnalysis(tag, route, airlines)
+                    self.analysis_cache.put(message, version, computed[message])
+            analyses = [analysis or computed[message] for message, analysis in zip(user_messages, analyses)]
+        return analyses
+
+    def respond(self, user_message, conversation_state, degraded=False, analysis=None):
+        if degraded:
+            return self.degraded_response(user_message)
+        if analysis is None:
+            analysis = self.analyze(user_message)
+        metrics.requests_total.inc(tag=analysis.tag)
+        if analysis.tag == "airline":
+            response = self.airline_tag_response(analysis, conversation_state)
+        elif analysis.tag == "recommended_airlines":
+            response = self.recommended_airlines_responses(analysis, conversation_state)
+        else:
+            response = self.other_tags_responses(analysis.tag)
+
+        if not response:
+            response = "Sorry, I couldn't understand that. Can you rephrase?"
+        return response
+
+    def degraded_response(self, user_message):  # under load: intent only, no NER, route lookup or recommendation
+        with metrics.timed("intent"):
+            tag = self.classifier.predict_intent(user_message)
+        metrics.requests_total.inc(tag=tag)
+        for intent in self.intents_data["intents"]:
+            if intent['tag'] == tag and intent.get('responses'):
+                return random.choice(intent['responses'])
+        return "Sorry, I couldn't understand that. Can you rephrase?"
+
+    def airline_tag_response(self, analysis, conversation_state):
+        matched_airlines = analysis.airlines
+        if matched_airlines:
+            conversation_state.route = analysis.route
+            conversation_state.airlines = matched_airlines
+            conversation_state.last_tag = analysis.tag
+
+            if len(matched_airlines) > 1:
+                airlines_list = ", ".join(matched_airlines[:-1]) + ", or " + matched_airlines[-1]
+                return random.choice(self.response_templates).format(airlines_list)
+            return f"The only airline available that i can provide for your route is {matched_airlines[0]}."
+        return random.choice(self.route_format_requests)
+
+    def recommended_airlines_responses(self, analysis, conversation_state):
+        route = conversation_state.route
+        matched_airlines = conversation_state.airlines
+
+        if not route or not matched_airlines:
+            route, matched_airlines = analysis.route, analysis.airlines
+            conversation_state.route = route
+            conversation_state.airlines = matched_airlines
+
+        if matched_airlines:
+            with metrics.timed("recommendation"):
+                ranking = self.sentiment_store.recommend(route, matched_airlines)
+            if ranking:
+                best_airline = ranking[0][0]
+                return random.choice(self.recommended_airlines_response_templates).format(best_airline=best_airline)
             else:
                 return "No clear best airline found based on the data."
         else:
             return "No airlines found for this route."
 
-    def other_tags_responses(self):
+    def other_tags_responses(self, tag):
         for intent in self.intents_data["intents"]:
-            if intent['tag'] == self.tag and intent['tag'] not in ["airline", "recommended_airlines"]:
+            if intent['tag'] == tag and intent['tag'] not in ["airline", "recommended_airlines"]:
                 if 'responses' in intent:
                     return random.choice(intent['responses'])
                 else:
                     return "I don't have enough information to respond to that right now."
         return "I'm not sure how to help with that."
 
-    def history_of_convo(self, histr_path, text):
-        with open(histr_path, "a") as file:
-            file.write(text + "\n")
+    def history_of_convo(self, histr_path, text):  # queued; a background thread appends lines in batches
+        history_writer(histr_path).write(text)
 
 
-def test():
-    classifier = IntentClassifier("./intents.json")
-    data_processor = ProcessingData("./airlines_reviews.csv")
-    processed_df = data_processor.handle_data(["Name", "Title", "Review Date", "Verified", "Type of Traveller", "Month Flown"])
+def build_chat_bot(intents_path="./intents.json", reviews_path="./airlines_reviews.csv",
+                   sentiment_path="./analyzed_sentiment_result.csv", n_jobs=-1):
+    classifier = IntentClassifier(intents_path, n_jobs=n_jobs)  # n_jobs only matters if the intent model is retrained
+    data_processor = ProcessingData(reviews_path)
     route_finder = RouteFinder(data_processor, ["Route", "Airline"])
-    intend_dt = classifier.load_model()
-    chat_bot = ChatBot(classifier, route_finder, data_processor, "./analyzed_sentiment_result.csv")
+    return ChatBot(classifier, route_finder, data_processor, sentiment_path)
+
+
+def test():
+    chat_bot = build_chat_bot()
+    conversation_state = ConversationState()
 
     while True:
         try:
             user_message = input()
             if user_message.lower() == 'exit':
                 break
-            
-            if not route_finder.find_matched_route(user_message):
-                predicted_intent = classifier.predict_intent(user_message)
-            else:
-                predicted_intent = classifier.predict_intent(user_message)
-            
-            chat_bot.set_user_message(user_message)
-
-            if chat_bot.tag == "airline":
-                response = chat_bot.airline_tag_response()
-            elif chat_bot.tag == "recommended_airlines":
-                conver_state = chat_bot.conversation_state
-                response = chat_bot.recommended_airlines_responses(user_message, conver_state)
-            else:
-                response = chat_bot.other_tags_responses()
-            
+
+            response = chat_bot.respond(user_message, conversation_state)
             print(response)
 
         except KeyboardInterrupt:
@@ -0,0 +1,33 @@
+import argparse
+import os
+import pandas as pd
+from chatbot import CATEGORICAL_COLUMNS, columnar_path
+
+
+def convert(csv_path, compression="snappy"):  # CSV -> Parquet with dictionary-encoded categorical columns
+    df = pd.read_csv(csv_path)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    parquet_path = columnar_path(csv_path)
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", compression=compression, index=False)
+    os.replace(tmp_path, parquet_path)  # loaders never see a half-written file
+    print(f"{csv_path}: {os.path.getsize(csv_path)} bytes -> {parquet_path}: {os.path.getsize(parquet_path)} bytes")
+    return parquet_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert review and sentiment CSVs to columnar Parquet files.")
+    parser.add_argument("paths", nargs="*", default=["./airlines_reviews.csv", "./analyzed_sentiment_result.csv"])
+    parser.add_argument("--compression", default="snappy",
+                        help="Parquet codec; 'none' trades a larger file for no decompression on load")
+    args = parser.parse_args()
+
+    compression = None if args.compression == "none" else args.compression
+    for path in args.paths:
+        convert(path, compression)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import json
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import deque
+
+ROUTE_CONNECTORS = {"to", "via", "and", "return"}
+SEGMENT_SEPARATOR = re.compile(r"\s+(?:to|via|and|return)\s+|/|,|&", re.IGNORECASE)
+SEGMENT_CODE = re.compile(r"^[A-Z]{3}$")
+# words that turn up in route data by accident ("Was to Izmir") and must never become place names
+STOPWORDS = {
+    "a", "about", "all", "am", "an", "any", "are", "as", "at", "back", "be", "been", "but", "by", "can", "could",
+    "did", "do", "does", "for", "from", "had", "has", "have", "here", "how", "i", "if", "in", "is", "it", "its",
+    "me", "my", "no", "not", "of", "on", "one", "or", "our", "round", "so", "that", "the", "their", "there",
+    "this", "trip", "was", "we", "were", "what", "when", "where", "which", "who", "why", "will", "with", "would",
+    "you", "your",
+}
+
+
+def normalize(text):  # lowercase, strip accents, keep only words separated by single spaces
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+
+class AhoCorasick:  # finds every occurrence of every pattern in one left-to-right pass
+    def __init__(self):
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for char in pattern:
+            next_node = self.transitions[node].get(char)
+            if next_node is None:
+                next_node = len(self.transitions)
+                self.transitions[node][char] = next_node
+                self.transitions.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = next_node
+        self.outputs[node].append((len(pattern), value))
+
+    def build(self):  # breadth-first failure links, each node inheriting its fallback's outputs
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.transitions[node].items():
+                queue.append(next_node)
+                fallback = self.fail[node]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.transitions[fallback].get(char, 0)
+                self.fail[next_node] = target if target != next_node else 0
+                self.outputs[next_node] = self.outputs[next_node] + self.outputs[self.fail[next_node]]
+        return self
+
+    def iter_matches(self, text):  # yields (start, end, value)
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self.transitions[node]:
+                node = self.fail[node]
+            node = self.transitions[node].get(char, 0)
+            for length, value in self.outputs[node]:
+                yield index - length + 1, index + 1, value
+
+
+class Gazetteer:  # location names and codes -> canonical location ids (lowercase IATA city/airport codes)
+    def __init__(self):
+        self.names = {}  # normalized name -> canonical id
+        self.codes = {}  # lowercase IATA code -> canonical id
+        self.display = {}  # canonical id -> text used when a route is written out
+        self.ambiguous = set()  # common words that only count as places when capitalized in a message
+        self.automaton = AhoCorasick().build()
+
+    @classmethod
+    def from_file(cls, path):
+        gazetteer = cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                aliases = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error loading airport aliases: {e}")
+            return gazetteer
+        for code, location in aliases.get("locations", {}).items():
+            gazetteer.add_location(code, location.get("names", []), location.get("codes", []))
+        gazetteer.ambiguous = {normalize(name) for name in aliases.get("ambiguous_names", [])}
+        return gazetteer.build()
+
+    def add_location(self, code, names, codes=()):
+        canonical = code.lower()
+        self.display[canonical] = code.upper()
+        for alias_code in [code, *codes]:
+            self.codes[alias_code.lower()] = canonical
+        for name in names:
+            self.names[normalize(name)] = canonical
+
+    def add_routes(self, routes):  # codes and names the alias table does not cover, learned from route data
+        for route in routes:
+            for segment in SEGMENT_SEPARATOR.split(str(route)):
+                words = [word for word in segment.split() if word.lower() not in ROUTE_CONNECTORS]  # "via via HKG"
+                if len(words) == 1 and SEGMENT_CODE.match(words[0]):
+                    code = words[0].lower()
+                    self.codes.setdefault(code, code)
+                    self.display.setdefault(code, words[0])
+                    continue
+                name = normalize(" ".join(words))
+                if len(name) < 3 or min(map(len, name.split())) < 2 or STOPWORDS.intersection(name.split()):
+                    continue  # "ba", "D.C.", "Was"
+                if name in self.names or name in self.codes or self.matches(name):
+                    continue
+                canonical = name.replace(" ", "_")
+                self.names[name] = canonical
+                self.display.setdefault(canonical, name)
+                self.ambiguous.add(name)  # route data is free text: only a capitalized mention counts as this place
+        return self.build()
+
+    def build(self):
+        automaton = AhoCorasick()
+        for name, canonical in self.names.items():
+            automaton.add(f" {name} ", (name, canonical))  # padded, so names only match whole words
+        self.automaton = automaton.build()
+        return self
+
+    def matches(self, normalized_text):  # leftmost-longest, non-overlapping (start_word, end_word, name, canonical)
+        padded = f" {normalized_text} "
+        word_starts = [0] + [index + 1 for index, char in enumerate(normalized_text) if char == " "]
+        found = sorted(self.automaton.iter_matches(padded), key=lambda match: (match[0], -match[1]))
+        results = []
+        covered_until = 0
+        for start, end, (name, canonical) in found:
+            if start < covered_until:
+                continue
+            first_word = bisect_left(word_starts, start)  # padded offsets are shifted by the leading space
+            results.append((first_word, first_word + len(name.split()), name, canonical))
+            covered_until = end - 1  # the trailing space may start the next match
+        return results
+
+    def locations(self, message):  # canonical ids of the places mentioned in a chat message, in order
+        locations = []
+        for _, _, name, canonical in self.matches(normalize(message)):
+            if name in self.ambiguous and not re.search(rf"\b{re.escape(name.title())}\b", message):
+                continue
+            if not locations or locations[-1] != canonical:
+                locations.append(canonical)
+        return locations
+
+    def tokens(self, route):  # canonical tokens for a route string; unknown words are kept as they are
+        words = normalize(route).split()
+        tokens = []
+        position = 0
+        for first_word, last_word, _, canonical in self.matches(" ".join(words)):
+            tokens.extend(self.codes.get(word, word) for word in words[position:first_word] if word not in ROUTE_CONNECTORS)
+            tokens.append(canonical)
+            position = last_word
+        tokens.extend(self.codes.get(word, word) for word in words[position:] if word not in ROUTE_CONNECTORS)
+        return [token for index, token in enumerate(tokens) if index == 0 or tokens[index - 1] != token]
+
+    def route_text(self, locations):
+        return " to ".join(self.display.get(canonical, canonical) for canonical in locations)
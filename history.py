@@ -0,0 +1,173 @@
+import atexit
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+import metrics
+
+try:
+    import fcntl  # serializes rotation between processes sharing one history file (POSIX only)
+except ImportError:
+    fcntl = None
+
+history_dropped_total = metrics.registry.counter("chatbot_history_dropped_total",
+                                                 "History lines dropped because the write queue was full.")
+
+STOP = object()
+
+
+class HistoryWriter:  # queues history lines and appends them in batches from a background thread
+    def __init__(self, path, max_queue=10000, batch_size=200, flush_interval=1.0, max_bytes=None,
+                 rotate_daily=False, compress=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # seconds a line may wait before it is written
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.file = None
+        self.opened_day = None
+
+    def write(self, text):  # never blocks: when the queue is full the line is dropped and counted
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except queue.Full:
+            history_dropped_total.inc()
+            return False
+
+    def ensure_started(self):  # started lazily, and again in a forked child where the thread does not exist
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.file = None
+                self.thread = threading.Thread(target=self.run, name="history-writer", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not STOP:  # fill the batch until it is full or due
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = STOP in batch
+            lines = [line for line in batch if line is not STOP]
+            if lines:
+                try:
+                    self.write_batch(lines)
+                except OSError as e:
+                    print(f"Error writing conversation history: {e}")
+            if stop:
+                self.close_file()
+                return
+
+    def write_batch(self, lines):
+        data = "".join(line + "\n" for line in lines)
+        incoming_bytes = len(data.encode("utf-8"))
+        self.reopen_if_moved()
+        if self.should_rotate(incoming_bytes):
+            self.rotate(incoming_bytes)
+        with self.locked(fcntl and fcntl.LOCK_SH):  # writers share the lock; only a rotation excludes them
+            self.reopen_if_moved()
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+                self.opened_day = time.strftime("%Y-%m-%d")
+            self.file.write(data)
+            self.file.flush()
+
+    def should_rotate(self, incoming_bytes):
+        if self.rotate_daily and self.opened_day and self.opened_day != time.strftime("%Y-%m-%d"):
+            return True
+        if self.max_bytes and os.path.exists(self.path):
+            return os.path.getsize(self.path) + incoming_bytes > self.max_bytes
+        return False
+
+    def reopen_if_moved(self):  # another process rotated the file away; our handle still points at the old one
+        if self.file is None:
+            return
+        try:
+            moved = os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self.close_file()
+            self.opened_day = None  # the other process already handled the day change
+
+    @contextmanager
+    def locked(self, operation):  # flock on a sidecar file, shared by every process writing this history
+        if fcntl is None:  # no fcntl, no fork: a single process is the only writer
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:  # opened per use, so forked children never share it
+            fcntl.flock(lock_file, operation)
+            yield  # released when the lock file is closed
+
+    def rotate(self, incoming_bytes):  # one process at a time; the others notice through reopen_if_moved
+        with self.locked(fcntl and fcntl.LOCK_EX):
+            self.reopen_if_moved()
+            if self.should_rotate(incoming_bytes):  # still needed after waiting for whoever held the lock
+                self.rotate_file()
+
+    def rotate_file(self):
+        self.close_file()
+        if not os.path.exists(self.path):
+            return
+        rotated_path = base_path = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rotated_path) or os.path.exists(f"{rotated_path}.gz"):  # several rotations in one second
+            rotated_path = f"{base_path}-{suffix}"
+            suffix += 1
+        os.replace(self.path, rotated_path)
+        if self.compress:
+            with open(rotated_path, "rb") as source, gzip.open(f"{rotated_path}.gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated_path)
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def close(self, timeout=5.0):  # flush everything queued so far and stop the thread
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except queue.Full:
+            print("Conversation history queue is full, some lines were not flushed.")
+            return
+        self.thread.join(timeout)
+
+
+writers = {}
+writers_lock = threading.Lock()
+
+
+def history_writer(path, **options):  # one writer per file, so concurrent callers never interleave partial lines
+    with writers_lock:
+        writer = writers.get(path)
+        if writer is None:
+            writer = writers[path] = HistoryWriter(path, **options)
+        return writer
+
+
+@atexit.register
+def close_all():
+    for writer in list(writers.values()):
+        writer.close()
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from chatbot import ALIASES_PATH, build_chat_bot, columnar_path, nlp_provider
+
+
+class ChatBotReloader:  # builds a complete ChatBot off to the side and swaps it in with one assignment
+    def __init__(self, intents_path="./intents.json", reviews_path="./airlines_reviews.csv",
+                 sentiment_path="./analyzed_sentiment_result.csv"):
+        self.intents_path = intents_path
+        self.reviews_path = reviews_path
+        self.sentiment_path = sentiment_path
+        self.build_lock = threading.Lock()  # one build at a time; requests never take this lock
+        self.chat_bot = None
+        self.status = {"state": "starting"}
+        self.watcher = None
+        self.watcher_pid = None
+        self.watcher_lock = threading.Lock()
+        self.failed_versions = None
+        # Retraining inside a serving process must leave cores for requests; the first build has none to serve yet.
+        self.reload_jobs = int(os.environ.get("CHATBOT_RELOAD_TRAIN_JOBS", 1))
+        self.build(n_jobs=-1)
+
+    def current(self):  # read once per request, so a request keeps the bot it started with
+        return self.chat_bot
+
+    def watched_paths(self):
+        sentiment_stem = os.path.splitext(self.sentiment_path)[0]
+        return [self.intents_path, ALIASES_PATH, self.reviews_path, columnar_path(self.reviews_path), self.sentiment_path,
+                columnar_path(self.sentiment_path), f"{sentiment_stem}_aggregates.csv"]
+
+    def file_versions(self):
+        versions = {}
+        for path in self.watched_paths():
+            try:
+                stat = os.stat(path)
+                versions[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                versions[path] = None
+        return versions
+
+    def build(self, n_jobs=None):
+        with self.build_lock:
+            versions = self.file_versions()
+            started = time.perf_counter()
+            chat_bot = build_chat_bot(self.intents_path, self.reviews_path, self.sentiment_path,
+                                      n_jobs=self.reload_jobs if n_jobs is None else n_jobs)
+            chat_bot.sentiment_store.auto_refresh = False  # data changes arrive through a new build instead
+            nlp_provider.refresh()  # picks up alias edits in the entity ruler, not just the gazetteer
+            chat_bot.route_finder.nlp  # make sure spaCy is loaded before the first request sees this bot
+            build_seconds = time.perf_counter() - started
+
+            self.chat_bot = chat_bot
+            self.status = {
+                "state": "ready",
+                "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "build_seconds": round(build_seconds, 3),
+                "intent_model": chat_bot.classifier.version,
+                "route_index": chat_bot.route_finder.version,
+                "reviews": len(chat_bot.route_finder.df),
+                "sentiment_files": chat_bot.sentiment_store.mtime,
+                "files": {path: version and version[0] for path, version in versions.items()},
+            }
+            self.versions = versions
+            print(f"Chat bot loaded in {build_seconds:.2f}s (intent model {chat_bot.classifier.version[:12]})")
+            return chat_bot
+
+    def reload(self, wait=False):  # rebuild in the background; returns False if a build is already running
+        if self.build_lock.locked():
+            return False
+        thread = threading.Thread(target=self.safe_build, name="chat-bot-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def safe_build(self):
+        try:
+            self.build()
+            return True
+        except Exception as e:  # keep serving the previous bot
+            print(f"Error reloading chat bot: {e}")
+            self.status = dict(self.status, last_error=str(e), last_error_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+            return False
+
+    def watch(self, interval=5.0):  # poll the data files and reload when any of them changes
+        if self.watcher is not None and self.watcher_pid == os.getpid() and self.watcher.is_alive():
+            return
+        with self.watcher_lock:
+            if self.watcher is None or self.watcher_pid != os.getpid() or not self.watcher.is_alive():
+                self.watcher_pid = os.getpid()  # threads do not survive a fork, so each worker starts its own
+                self.watcher = threading.Thread(target=self.poll, args=(interval,), name="chat-bot-watcher", daemon=True)
+                self.watcher.start()
+
+    def pending_versions(self):  # current file versions if they differ from both the loaded and the last failed build
+        versions = self.file_versions()
+        return None if versions in (self.versions, self.failed_versions) else versions
+
+    def poll(self, interval):
+        while True:
+            time.sleep(interval)
+            versions = self.pending_versions()
+            if versions is None or self.build_lock.locked():
+                continue
+            if not self.safe_build():
+                self.failed_versions = versions  # retry only once the files change again
@@ -0,0 +1,101 @@
+import json
+import os
+import re
+import numpy as np
+
+
+class CompactIntentModel:  # TF-IDF + linear classifier inference with nothing but NumPy
+    def __init__(self, vocabulary, idf, coef, intercept, classes, ngram_range=(1, 1), lowercase=True,
+                 token_pattern=r"(?u)\b\w\w+\b", norm="l2", sublinear_tf=False, key=None):
+        self.vocabulary = vocabulary  # term -> column, exactly TfidfVectorizer.vocabulary_
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.ngram_range = tuple(ngram_range)
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+        self.token_regex = re.compile(token_pattern)
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.key = key
+
+    @classmethod
+    def from_pipeline(cls, pipeline, key=None):  # read the fitted sklearn Pipeline's tfidf/clf steps
+        tfidf, clf = pipeline['tfidf'], pipeline['clf']
+        if tfidf.analyzer != "word" or tfidf.stop_words or tfidf.strip_accents or tfidf.preprocessor or tfidf.tokenizer:
+            raise ValueError("Only the default word analyzer can be exported.")
+        vocabulary = {term: int(index) for term, index in tfidf.vocabulary_.items()}
+        return cls(vocabulary, tfidf.idf_, clf.coef_, clf.intercept_, clf.classes_, tfidf.ngram_range,
+                   tfidf.lowercase, tfidf.token_pattern, tfidf.norm, tfidf.sublinear_tf, key)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        metadata = {"ngram_range": list(self.ngram_range), "lowercase": self.lowercase,
+                    "token_pattern": self.token_pattern, "norm": self.norm, "sublinear_tf": self.sublinear_tf,
+                    "key": self.key}
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, terms=np.array(terms, dtype=str), idf=self.idf, coef=self.coef,
+                 intercept=self.intercept, classes=self.classes.astype(str), metadata=np.array(json.dumps(metadata)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            vocabulary = {str(term): index for index, term in enumerate(data["terms"])}  # columns were saved in order
+            return cls(vocabulary, data["idf"], data["coef"], data["intercept"], data["classes"],
+                       metadata["ngram_range"], metadata["lowercase"], metadata["token_pattern"], metadata["norm"],
+                       metadata["sublinear_tf"], metadata["key"])
+
+    @classmethod
+    def load_if_fresh(cls, path, key):  # None when missing, unreadable or built for different intents
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            model = cls.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading compact intent model: {e}")
+            return None
+        return model if model.key == key else None
+
+    def analyze(self, text):  # mirrors TfidfVectorizer's word analyzer: lowercase, token regex, n-grams
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_regex.findall(text)
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            terms.extend(" ".join(tokens[start:start + n]) for start in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts):
+        features = np.zeros((len(texts), len(self.idf)))
+        for row, text in enumerate(texts):
+            for term in self.analyze(text):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    features[row, column] += 1
+        if self.sublinear_tf:
+            counted = features > 0
+            features[counted] = np.log(features[counted]) + 1
+        features *= self.idf
+        if self.norm == "l2":
+            lengths = np.sqrt((features ** 2).sum(axis=1, keepdims=True))
+            features /= np.where(lengths == 0, 1, lengths)
+        elif self.norm == "l1":
+            lengths = np.abs(features).sum(axis=1, keepdims=True)
+            features /= np.where(lengths == 0, 1, lengths)
+        return features
+
+    def decision_function(self, texts):
+        return self.transform(texts) @ self.coef.T + self.intercept
+
+    def predict(self, texts):
+        scores = self.decision_function(texts)
+        if scores.shape[1] == 1:  # binary LogisticRegression keeps one row of coefficients
+            return self.classes[(scores[:, 0] > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
@@ -0,0 +1,167 @@
+import cProfile
+import os
+import random
+import threading
+import time
+
+enabled = os.environ.get("CHATBOT_METRICS", "1") != "0"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def set_enabled(value):
+    global enabled
+    enabled = value
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        if not enabled:
+            return
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}  # labels -> [per-bucket counts, sum, count]
+
+    def observe(self, value, **labels):
+        if not enabled:
+            return
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (bucket_counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, ('le', bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, label_names=()):
+        metric = Counter(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, label_names, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):  # Prometheus text exposition format
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_seconds = registry.histogram("chatbot_stage_seconds", "Time spent in each message handling stage.", ["stage"])
+request_seconds = registry.histogram("chatbot_request_seconds", "End-to-end request handling time.", ["endpoint"])
+requests_total = registry.counter("chatbot_requests_total", "Messages handled, by predicted intent tag.", ["tag"])
+analysis_cache_total = registry.counter("chatbot_analysis_cache_total", "Analysis cache lookups.", ["result"])
+errors_total = registry.counter("chatbot_errors_total", "Exceptions raised, by stage.", ["stage"])
+
+
+class StageTimer:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        stage_seconds.observe(time.perf_counter() - self.started, stage=self.stage)
+        if exc_type is not None:
+            errors_total.inc(stage=self.stage)
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+def timed(stage):  # `with timed("intent"): ...`; a shared no-op when metrics are disabled
+    return StageTimer(stage) if enabled else NULL_TIMER
+
+
+class SlowRequestProfiler:  # profiles a sample of requests and keeps the profile only when the request was slow
+    def __init__(self, sample_rate=None, slow_seconds=None, directory=None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.environ.get("CHATBOT_PROFILE_RATE", 0))
+        self.slow_seconds = slow_seconds if slow_seconds is not None else float(os.environ.get("CHATBOT_SLOW_REQUEST_SECONDS", 1.0))
+        self.directory = directory or os.environ.get("CHATBOT_PROFILE_DIR", "./profiles")
+
+    def profile(self, func, *args, **kwargs):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.slow_seconds:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"slow-{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{threading.get_ident()}.prof")
+                profiler.dump_stats(path)  # inspect with `python -m pstats <file>` or snakeviz
+                print(f"Slow request ({elapsed:.2f}s) profile saved to {path}")
@@ -1,31 +1,18 @@
+import argparse
+import hashlib
+import os
 import re
 import string
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import nltk
-from nltk.corpus import stopwords
 from nltk.sentiment import SentimentIntensityAnalyzer
-nltk.download('stopwords')
-nltk.download('vader_lexicon')
-from collections import Counter
 
-# Initialize stop words and SentimentIntensityAnalyzer
-stop_words = set(stopwords.words('english'))
-sia = SentimentIntensityAnalyzer()
-
-# Load data
-df = pd.read_csv("/Users/phuongnguyen/Desktop/MyBot/airlines_reviews.csv")
-
-
-def cleaning(text):        
-    text = text.lower() # converting to lowercase
-    text = re.sub('https?://\S+|www\.\S+', '', text) # removing URL links
-    text = re.sub(r"\b\d+\b", "", text) # removing number 
-    text = re.sub('<.*?>+', '', text) # removing special characters, 
-    text = re.sub('[%s]' % re.escape(string.punctuation), '', text) # punctuations
-    text = re.sub('\n', '', text)
-    text = re.sub('[’“”…]', '', text)
-   
-    emoji_pattern = re.compile("["
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')  # removing URL links
+NUMBER_PATTERN = re.compile(r"\b\d+\b")  # removing number
+TAG_PATTERN = re.compile('<.*?>+')  # removing special characters
+PUNCTUATION_PATTERN = re.compile('[%s\n’“”…]' % re.escape(string.punctuation))  # punctuations, line breaks and curly quotes
+EMOJI_PATTERN = re.compile("["
                            u"\U0001F600-\U0001F64F"  # emoticons
                            u"\U0001F300-\U0001F5FF"  # symbols & pictographs
                            u"\U0001F680-\U0001F6FF"  # transport & map symbols
@@ -33,50 +20,158 @@ def cleaning(text):
                            u"\U00002702-\U000027B0"
                            u"\U000024C2-\U0001F251"
                            "]+", flags=re.UNICODE)
-    text = emoji_pattern.sub(r'', text)       
-    text=re.sub("isn't",'is not',text)
-    text=re.sub("he's",'he is',text)
-    text=re.sub("wasn't",'was not',text)
-    text=re.sub("there's",'there is',text)
-    text=re.sub("couldn't",'could not',text)
-    text=re.sub("won't",'will not',text)
-    text=re.sub("they're",'they are',text)
-    text=re.sub("she's",'she is',text)
-    text=re.sub("There's",'there is',text)
-    text=re.sub("wouldn't",'would not',text)
-    text=re.sub("haven't",'have not',text)
-    text=re.sub("That's",'That is',text)
-    text=re.sub("you've",'you have',text)
-    text=re.sub("He's",'He is',text)
-    text=re.sub("what's",'what is',text)
-    text=re.sub("weren't",'were not',text)
-    text=re.sub("we're",'we are',text)
-    text=re.sub("hasn't",'has not',text)
-    text=re.sub("you'd",'you would',text)
-    text=re.sub("shouldn't",'should not',text)
-    text=re.sub("let's",'let us',text)
-    text=re.sub("they've",'they have',text)
-    text=re.sub("You'll",'You will',text)
-    text=re.sub("i'm",'i am',text)
-    text=re.sub("we've",'we have',text)
-    text=re.sub("it's",'it is',text)
-    text=re.sub("don't",'do not',text)
-    text=re.sub("that´s",'that is',text)
-    text=re.sub("I´m",'I am',text)
-    text=re.sub("it’s",'it is',text)
-    text=re.sub("she´s",'she is',text)
-    text=re.sub("he’s'",'he is',text)
-    text=re.sub('I’m','I am',text)
-    text=re.sub('I’d','I did',text)
-    text=re.sub("he’s'",'he is',text)
-    text=re.sub('there’s','there is',text)
+
+CONTRACTIONS = {
+    "isn't": 'is not', "he's": 'he is', "wasn't": 'was not', "there's": 'there is', "couldn't": 'could not',
+    "won't": 'will not', "they're": 'they are', "she's": 'she is', "There's": 'there is', "wouldn't": 'would not',
+    "haven't": 'have not', "That's": 'That is', "you've": 'you have', "He's": 'He is', "what's": 'what is',
+    "weren't": 'were not', "we're": 'we are', "hasn't": 'has not', "you'd": 'you would', "shouldn't": 'should not',
+    "let's": 'let us', "they've": 'they have', "You'll": 'You will', "i'm": 'i am', "we've": 'we have',
+    "it's": 'it is', "don't": 'do not', "that´s": 'that is', "I´m": 'I am', "it’s": 'it is', "she´s": 'she is',
+    "he’s'": 'he is', 'I’m': 'I am', 'I’d': 'I did', 'there’s': 'there is'
+}
+# longest first, so e.g. "she's" wins over "he's" exactly as the old one-by-one substitutions resolved it
+CONTRACTION_PATTERN = re.compile("|".join(re.escape(key) for key in sorted(CONTRACTIONS, key=len, reverse=True)))
+
+sia = None  # created lazily so every pool process builds its own analyzer
+
+
+def cleaning(text):
+    text = text.lower() # converting to lowercase
+    text = URL_PATTERN.sub('', text)
+    text = NUMBER_PATTERN.sub('', text)
+    text = TAG_PATTERN.sub('', text)
+    text = PUNCTUATION_PATTERN.sub('', text)
+    text = EMOJI_PATTERN.sub('', text)
+    text = CONTRACTION_PATTERN.sub(lambda match: CONTRACTIONS[match.group()], text)  # every contraction in one pass
     return text
 
 def analyze_sentiment(text):
-    return sia.polarity_scores(text)["positive"]
-df['cleaned_reviews'] = df['Reviews'].apply(cleaning)
-df['sentiment_score'] = df['cleaned_reviews'].apply(analyze_sentiment)
-airline_route_sentiments = df[['Airline', 'Route', 'sentiment_score']].sort_values(by='Route')
-new_data = pd.DataFrame(airline_route_sentiments)
-analyzed_sentiment_result= new_data.to_csv('/Users/phuongnguyen/Desktop/MyBot/analyzed_sentiment_result.csv', index=False)
-print(analyzed_sentiment_result)
\ No newline at end of file
+    global sia
+    if sia is None:
+        sia = SentimentIntensityAnalyzer()
+    return sia.polarity_scores(text)["compound"]
+
+def score_reviews(reviews):  # clean and score one chunk of reviews inside a pool process
+    cleaned_reviews = [cleaning(review) for review in reviews]
+    return cleaned_reviews, [analyze_sentiment(review) for review in cleaned_reviews]
+
+def score_dataframe(df, workers=None, chunk_size=2000):
+    if df.empty:
+        df['cleaned_reviews'] = []
+        df['sentiment_score'] = []
+        return df
+    reviews = df['Reviews'].fillna('').astype(str).tolist()
+    chunks = [reviews[start:start + chunk_size] for start in range(0, len(reviews), chunk_size)]
+    cleaned_reviews, sentiment_scores = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for cleaned, scores in pool.map(score_reviews, chunks):  # map keeps chunk order, so rows line up
+            cleaned_reviews.extend(cleaned)
+            sentiment_scores.extend(scores)
+    df['cleaned_reviews'] = cleaned_reviews
+    df['sentiment_score'] = sentiment_scores
+    return df
+
+def companion_path(output, suffix):  # analyzed_sentiment_result.csv -> analyzed_sentiment_result_<suffix>.csv
+    return f"{os.path.splitext(output)[0]}_{suffix}.csv"
+
+def read_reviews(path):  # accepts the raw CSV or the Parquet copy written by `convert_data.py`
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def review_hashes(df):  # content hash per review, so edited reviews are rescored and untouched ones are reused
+    hashes = pd.util.hash_pandas_object(df[['Airline', 'Route', 'Reviews']].astype(object).fillna('').astype(str), index=False)
+    return hashes.map('{:016x}'.format)
+
+def manifest_digest(manifest):  # identifies a manifest, so an aggregates file can say which one it was built from
+    digest = hashlib.sha256()
+    for review_hash in manifest['review_hash']:
+        digest.update(f"{review_hash}\n".encode())
+    return digest.hexdigest()[:16]
+
+def write_csv(df, path):  # temp file + rename, so readers and the next run never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def aggregate(rows):  # (Route, Airline) -> count and sum of sentiment scores
+    grouped = rows.groupby(['Route', 'Airline'], observed=True)['sentiment_score'].agg(['count', 'sum'])
+    return grouped.reset_index()
+
+def update_aggregates(aggregates, old_manifest, new_manifest):  # apply only the added and removed reviews
+    old_counts = old_manifest['review_hash'].value_counts()
+    new_counts = new_manifest['review_hash'].value_counts()
+    delta_counts = new_counts.sub(old_counts, fill_value=0)
+    delta_counts = delta_counts[delta_counts != 0]
+    if delta_counts.empty:
+        return aggregates
+
+    reviews = pd.concat([old_manifest, new_manifest]).drop_duplicates('review_hash').set_index('review_hash')
+    delta = reviews.loc[delta_counts.index, ['Route', 'Airline', 'sentiment_score']]
+    delta['count'] = delta_counts
+    delta['sum'] = delta['count'] * delta['sentiment_score']
+    delta = delta.groupby(['Route', 'Airline'])[['count', 'sum']].sum().reset_index()
+
+    merged = pd.concat([aggregates, delta]).groupby(['Route', 'Airline'])[['count', 'sum']].sum().reset_index()
+    merged['count'] = merged['count'].round().astype(int)
+    return merged[merged['count'] > 0]
+
+def analyze(input_path, output, workers=None, chunk_size=2000, incremental=False):
+    manifest_path = companion_path(output, "manifest")
+    aggregates_path = companion_path(output, "aggregates")
+    df = read_reviews(input_path)
+    df['review_hash'] = review_hashes(df)
+
+    old_manifest = None
+    old_aggregates = None
+    if incremental and os.path.exists(manifest_path):
+        old_manifest = pd.read_csv(manifest_path, dtype={'review_hash': str})
+        if os.path.exists(aggregates_path):
+            old_aggregates = pd.read_csv(aggregates_path, dtype={'manifest_digest': str})
+            if set(old_aggregates.get('manifest_digest', [])) != {manifest_digest(old_manifest)}:
+                # the two files come from different runs (e.g. a crash between the writes): a delta would
+                # double count or drop reviews, so rebuild the aggregates from the manifest instead
+                print("Sentiment aggregates do not match the manifest, rebuilding them")
+                old_aggregates = None
+
+    if old_manifest is None:
+        df = score_dataframe(df, workers, chunk_size)
+        print(f"Scored all {len(df)} reviews")
+    else:
+        known_scores = old_manifest.drop_duplicates('review_hash').set_index('review_hash')['sentiment_score']
+        is_new = ~df['review_hash'].isin(known_scores.index)
+        new_reviews = score_dataframe(df[is_new].copy(), workers, chunk_size)
+        df['sentiment_score'] = df['review_hash'].map(known_scores)
+        df.loc[is_new, 'sentiment_score'] = new_reviews['sentiment_score']
+        print(f"Scored {int(is_new.sum())} new or changed reviews, reused {int((~is_new).sum())}")
+
+    new_manifest = df[['review_hash', 'Airline', 'Route', 'sentiment_score']]
+    if old_aggregates is None:
+        aggregates = aggregate(new_manifest)
+    else:
+        aggregates = update_aggregates(old_aggregates[['Route', 'Airline', 'count', 'sum']], old_manifest, new_manifest)
+    aggregates['manifest_digest'] = manifest_digest(new_manifest)
+
+    airline_route_sentiments = df[['Airline', 'Route', 'sentiment_score']].sort_values(by='Route')
+    new_data = pd.DataFrame(airline_route_sentiments)
+    write_csv(new_data, output)
+    write_csv(new_manifest, manifest_path)
+    write_csv(aggregates, aggregates_path)  # carries the manifest digest, so a crash between writes is detected
+    print(f"Wrote {len(new_data)} scored reviews to {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean and score airline reviews with VADER.")
+    parser.add_argument("--input", default="./airlines_reviews.csv")
+    parser.add_argument("--output", default="./analyzed_sentiment_result.csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="scoring processes")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="reviews per pool task")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only score reviews missing from the manifest of the previous run")
+    args = parser.parse_args()
+
+    nltk.download('vader_lexicon')
+    analyze(args.input, args.output, args.workers, args.chunk_size, args.incremental)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from http.cookies import SimpleCookie
+from chatbot import ConversationState, IntentClassifier, build_chat_bot
+from history import history_writer
+from sessions import MemorySessionStore
+
+POOL_SIZE = int(os.environ.get("CHATBOT_POOL_SIZE", os.cpu_count() or 1))
+# A timed-out request gets its 504 straight away, but its job keeps running to completion in the pool process,
+# so the requests queued behind it still wait. The timeout bounds what a client sees, not the pool's backlog.
+REQUEST_TIMEOUT = float(os.environ.get("CHATBOT_REQUEST_TIMEOUT", 10))
+HISTORY_PATH = "./conversation_history.txt"
+history_writer(HISTORY_PATH, max_bytes=50 * 1024 * 1024, rotate_daily=True, compress=True)  # same rotation as app.py
+
+worker_chat_bot = None  # built once per pool process by init_worker
+
+
+def init_worker(intents_path, reviews_path, sentiment_path):
+    global worker_chat_bot
+    # startup() already trained the intent model; n_jobs=1 bounds the cost if the artifact went stale meanwhile
+    worker_chat_bot = build_chat_bot(intents_path, reviews_path, sentiment_path, n_jobs=1)
+    worker_chat_bot.route_finder.nlp  # load spaCy now rather than on the first request
+
+
+def warm_up():
+    return os.getpid()
+
+
+def respond_in_worker(user_message, state_data):  # runs in a pool process; state travels as a plain dict
+    conversation_state = ConversationState.from_dict(state_data)
+    response = worker_chat_bot.respond(user_message, conversation_state)
+    return response, conversation_state.to_dict()
+
+
+class AsyncChatApp:  # minimal ASGI app exposing the same /message contract as app.py
+    def __init__(self, pool_size=POOL_SIZE, request_timeout=REQUEST_TIMEOUT, intents_path="./intents.json",
+                 reviews_path="./airlines_reviews.csv", sentiment_path="./analyzed_sentiment_result.csv"):
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self.paths = (intents_path, reviews_path, sentiment_path)
+        # bounded and expiring, so clients that drop the cookie cannot grow it without limit
+        self.conversations = MemorySessionStore(int(os.environ.get("CHATBOT_SESSION_MAX", 10000)),
+                                                ttl=float(os.environ.get("CHATBOT_SESSION_TTL", 86400)))
+        self.pool = None
+
+    async def startup(self):
+        loop = asyncio.get_running_loop()
+        # Train or refresh the intent artifact once, here, so the pool processes only ever load it.
+        await loop.run_in_executor(None, IntentClassifier, self.paths[0])
+        self.pool = ProcessPoolExecutor(max_workers=self.pool_size, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker, initargs=self.paths)
+        await asyncio.gather(*(loop.run_in_executor(self.pool, warm_up) for _ in range(self.pool_size)))
+
+    async def shutdown(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope, receive, send):
+        if scope["path"] != "/message" or scope["method"] != "POST":
+            await self.send_json(send, 404, {"message": "Not found"})
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        chat_id, state_data = self.conversation(scope)
+        try:
+            user_input = json.loads(body or b"{}").get("message")
+            if not user_input:
+                raise ValueError("Empty message received")
+
+            loop = asyncio.get_running_loop()
+            work = loop.run_in_executor(self.pool, respond_in_worker, user_input, state_data)
+            response, state_data = await asyncio.wait_for(work, self.request_timeout)
+            self.conversations.set(chat_id, state_data)
+            history_writer(HISTORY_PATH).write(f"User: {user_input}\nChatbot: {response}")
+            await self.send_json(send, 200, {"message": response}, chat_id)
+
+        except asyncio.TimeoutError:
+            print(f"Timed out processing message after {self.request_timeout}s")
+            await self.send_json(send, 504, {"message": "Error processing your message"}, chat_id)
+        except Exception as e:
+            print(f"Error processing message: {e}")
+            await self.send_json(send, 500, {"message": "Error processing your message"}, chat_id)
+
+    def conversation(self, scope):  # (chat_id, state dict); ids this server did not issue, or has expired, start over
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookie = SimpleCookie(value.decode("latin-1"))
+                if "chat_id" in cookie:
+                    state_data = self.conversations.get(cookie["chat_id"].value)
+                    if state_data is not None:
+                        return cookie["chat_id"].value, state_data
+        return secrets.token_urlsafe(32), ConversationState().to_dict()
+
+    async def send_json(self, send, status, payload, chat_id=None):
+        headers = [(b"content-type", b"application/json")]
+        if chat_id:
+            headers.append((b"set-cookie", f"chat_id={chat_id}; Path=/; HttpOnly; SameSite=Lax".encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+
+app = AsyncChatApp()
+
+
+if __name__ == "__main__":
+    import uvicorn  # Make sure to install this with `pip install uvicorn`
+
+    parser = argparse.ArgumentParser(description="Serve the chat bot over ASGI with a process pool for CPU work.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5003)
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="worker processes, each preloading the models")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="per-request timeout in seconds")
+    args = parser.parse_args()
+
+    app.pool_size = args.pool_size
+    app.request_timeout = args.timeout
+    uvicorn.run(app, host=args.host, port=args.port)
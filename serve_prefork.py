@@ -0,0 +1,156 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from werkzeug.serving import make_server
+import history
+import metrics
+
+children = set()
+stopping = False
+reload_requested = False
+
+
+def serve_worker(app, sock, host, port, threaded):  # runs in a forked child on the shared listening socket
+    server = make_server(host, port, app, threaded=threaded, fd=sock.fileno())
+
+    def stop_worker(signum, frame):  # shutdown() waits for serve_forever, which runs in this very thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, stop_worker)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)  # reloads belong to the master
+    print(f"Worker {os.getpid()} serving on {host}:{port}")
+    server.serve_forever()
+    history.close_all()  # the worker leaves through os._exit, which skips atexit hooks
+
+
+def spawn(app, sock, host, port, threaded):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_worker(app, sock, host, port, threaded)
+        finally:
+            os._exit(0)
+    children.add(pid)
+    return pid
+
+
+def stop(signum, frame):
+    global stopping
+    stopping = True
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def request_reload(signum, frame):  # SIGHUP, also sent by a worker's /admin/reload
+    global reload_requested
+    reload_requested = True
+
+
+def prepare_for_fork(chat_bot):
+    from chatbot import ConversationState
+    metrics_enabled = metrics.enabled
+    metrics.set_enabled(False)  # every worker inherits the registry, so keep the warm-up out of it
+    try:
+        chat_bot.respond("hi", ConversationState())  # warm lazy paths before forking
+    finally:
+        metrics.set_enabled(metrics_enabled)
+    chat_bot.analysis_cache.clear()
+
+    # Move everything allocated so far out of the GC's view, so collections in the workers do not touch
+    # (and copy) the pages holding the shared models. Unfreezing first lets a replaced bot be collected.
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+
+
+def reload_workers(flask_app, sock, args):  # rebuild once in the master, then replace the workers one at a time
+    global reload_requested
+    reload_requested = False
+    reloader = flask_app.reloader
+    versions = reloader.file_versions()
+    if not reloader.safe_build():
+        reloader.failed_versions = versions  # keep serving the old models until the files change again
+        return
+    prepare_for_fork(reloader.current())
+    for pid in list(children):  # start the replacement first, so capacity never drops by more than one worker
+        if stopping:
+            return
+        spawn(flask_app.app, sock, args.host, args.port, args.threaded)
+        children.discard(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+    print(f"Master {os.getpid()} restarted {len(children)} workers on the new models")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the chat bot once, then fork workers that share it.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5002)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threaded", action="store_true",
+                        help="serve each request on its own thread; the admission controller bounds how many run")
+    parser.add_argument("--watch-interval", type=float, default=5.0,
+                        help="seconds between data file checks in the master, 0 to reload only on SIGHUP")
+    args = parser.parse_args()
+
+    # Workers are separate processes, so sessions must live somewhere they can all reach.
+    os.environ.setdefault("CHATBOT_SESSION_BACKEND", "sqlite")
+    # The master owns reloads: a watcher in every worker would rebuild N private copies of the models.
+    os.environ.setdefault("CHATBOT_WATCH_INTERVAL", "0")
+    os.environ["CHATBOT_MASTER_PID"] = str(os.getpid())
+
+    # Build every read-only model in the master: classifier, route index, sentiment store and spaCy.
+    # Background threads (history writer) start lazily on a worker's first request, after the fork.
+    import app as flask_app
+    prepare_for_fork(flask_app.reloader.current())
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, request_reload)
+    for _ in range(args.workers):
+        spawn(flask_app.app, sock, args.host, args.port, args.threaded)
+    print(f"Master {os.getpid()} started {args.workers} workers")
+
+    next_check = time.monotonic() + args.watch_interval
+    while children:
+        if not stopping and args.watch_interval > 0 and time.monotonic() >= next_check:
+            next_check = time.monotonic() + args.watch_interval
+            if flask_app.reloader.pending_versions() is not None:
+                request_reload(None, None)
+        if reload_requested and not stopping:
+            reload_workers(flask_app, sock, args)
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)  # polled, so reload requests are seen between exits
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, restarting")
+            time.sleep(1)  # avoid a tight respawn loop if workers crash on start
+            spawn(flask_app.app, sock, args.host, args.port, args.threaded)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
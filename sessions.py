@@ -0,0 +1,134 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class MemorySessionStore:  # in-process LRU with expiry; sessions are lost on restart and not shared between workers
+    def __init__(self, max_sessions=10000, ttl=86400):
+        self.max_sessions = max_sessions
+        self.ttl = ttl  # seconds since the last write
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # sid -> (expires_at, payload)
+
+    def get(self, sid):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[sid]
+                return None
+            self.entries.move_to_end(sid)
+            return json.loads(entry[1])  # a fresh copy, like a payload read from disk
+
+    def set(self, sid, data):
+        payload = json.dumps(data, separators=(",", ":"))
+        with self.lock:
+            self.entries[sid] = (time.time() + self.ttl, payload)
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_sessions:
+                self.entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self.lock:
+            self.entries.pop(sid, None)
+
+
+class SQLiteSessionStore:  # one small row per session in a WAL database, shared by every worker on the host
+    def __init__(self, path="./sessions.sqlite3", ttl=86400, purge_interval=300):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.local = threading.local()  # sqlite3 connections must not cross threads or forks
+        self.last_purge = 0.0
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS sessions "
+                               "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")  # WAL keeps the database consistent; only the last commits can be lost
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def get(self, sid):
+        row = self.connection().execute("SELECT data FROM sessions WHERE sid = ? AND expires_at >= ?",
+                                        (sid, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, sid, data):
+        now = time.time()
+        with self.connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                               (sid, json.dumps(data, separators=(",", ":")), now + self.ttl))
+            if now - self.last_purge > self.purge_interval:
+                self.last_purge = now
+                connection.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+
+    def delete(self, sid):
+        with self.connection() as connection:
+            connection.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class StoreSessionInterface(SessionInterface):  # the cookie carries only a random id; the payload lives in the store
+    def __init__(self, store, max_messages=20):
+        self.store = store
+        self.max_messages = max_messages  # recent chat window kept in session['messages']
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return StoredSession(data, sid=sid)
+        return StoredSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:  # emptied during the request
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+        data = dict(session)
+        if isinstance(data.get("messages"), list):
+            data["messages"] = data["messages"][-self.max_messages:]
+        self.store.set(session.sid, data)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path, secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def session_store_from_env():  # CHATBOT_SESSION_BACKEND=memory (default) or sqlite
+    backend = os.environ.get("CHATBOT_SESSION_BACKEND", "memory")
+    ttl = float(os.environ.get("CHATBOT_SESSION_TTL", 86400))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.environ.get("CHATBOT_SESSION_DB", "./sessions.sqlite3"), ttl=ttl)
+    if backend == "memory":
+        return MemorySessionStore(int(os.environ.get("CHATBOT_SESSION_MAX", 10000)), ttl=ttl)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,68 @@
+from chatbot import ALIASES_PATH, location_patterns
+from gazetteer import AhoCorasick, Gazetteer, normalize
+
+DIRTY_ROUTES = [  # verbatim from analyzed_sentiment_result.csv
+    "LHR to PER via via HKG",
+    "Was to Izmir",
+    "Manchester to Auckland and return via Hong Kong",
+    "Atlanta to Chennai return via Doha",
+    "Bangkok, to Milan via via Paris",
+]
+gazetteer = Gazetteer.from_file(ALIASES_PATH).add_routes(["Phuket to Singapore", "Timbuktu to Split", *DIRTY_ROUTES])
+
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = AhoCorasick()
+    for pattern in ("he", "she", "hers"):
+        automaton.add(pattern, pattern)
+    automaton.build()
+    assert sorted(automaton.iter_matches("ushers")) == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_normalize_strips_case_accents_and_punctuation():
+    assert normalize("Zürich, Switzerland!") == "zurich switzerland"
+
+
+def test_names_and_codes_share_tokens():
+    assert gazetteer.tokens("Phuket to Singapore") == gazetteer.tokens("HKT to SIN") == ["hkt", "sin"]
+    assert gazetteer.tokens("London Heathrow to Paris via Singapore") == ["lon", "par", "sin"]
+    assert gazetteer.tokens("LHR to CDG") == ["lon", "par"]
+
+
+def test_longest_name_wins():
+    assert gazetteer.tokens("london heathrow") == ["lon"]
+    assert gazetteer.locations("from new york jfk to hong kong") == ["nyc", "hkg"]
+
+
+def test_names_match_whole_words_only():
+    assert gazetteer.locations("I love parisian food") == []
+
+
+def test_ambiguous_names_need_a_capital():
+    assert gazetteer.locations("the flight was nice") == []
+    assert gazetteer.locations("flying to Nice from London") == ["nce", "lon"]
+    assert gazetteer.locations("the seats were male only") == []
+    assert gazetteer.locations("a trip to Male") == ["mle"]
+
+
+def test_route_names_need_a_capital():
+    assert gazetteer.locations("from Timbuktu to Split") == ["timbuktu", "split"]
+    assert gazetteer.locations("from timbuktu to split") == []
+    assert gazetteer.route_text(gazetteer.locations("Phuket to Singapore")) == "HKT to SIN"
+
+
+def test_dirty_routes_add_codes_but_no_junk_names():
+    assert gazetteer.tokens("LHR to PER via via HKG") == ["lon", "per", "hkg"]
+    assert gazetteer.tokens("London to Sydney via HKG") == ["lon", "syd", "hkg"]
+    assert gazetteer.tokens("Manchester to Auckland and return via Hong Kong") == ["man", "akl", "hkg"]
+    assert not {"via hkg", "hkg", "was", "return", "return via hong kong"} & set(gazetteer.names)
+    assert gazetteer.locations("the flight was great") == []
+    assert gazetteer.locations("Was it worth it? Can I return my ticket?") == []
+
+
+def test_entity_ruler_only_matches_capitalized_ambiguous_names():
+    patterns = {tuple(tuple(token.items())[0] for token in pattern["pattern"])
+                for pattern in location_patterns() if isinstance(pattern["pattern"], list)}
+    assert (("ORTH", "Nice"),) in patterns
+    assert (("LOWER", "nice"),) not in patterns
+    assert (("LOWER", "new"), ("LOWER", "york")) in patterns
@@ -0,0 +1,31 @@
+from chatbot import RouteIndex, route_tokens
+
+PAIRS = [
+    ("London to Dubai", "Emirates"),
+    ("Dubai to Paris", "Emirates"),  # a hub carrier serving both cities, but never on one route
+    ("London to Paris", "Air France"),
+    ("London to Paris", "British Airways"),
+    ("London to Sydney via Singapore", "Qantas"),
+]
+
+
+def airlines(route):
+    return RouteIndex(PAIRS, route_tokens).airlines(route_tokens(route))
+
+
+def test_locations_must_share_a_route():
+    assert airlines("London to Paris") == ["Air France", "British Airways"]
+
+
+def test_single_location_matches_every_route_through_it():
+    assert airlines("Paris") == ["Air France", "British Airways", "Emirates"]
+
+
+def test_via_hop_counts_as_part_of_the_route():
+    assert airlines("London to Singapore") == ["Qantas"]
+    assert airlines("London to Sydney") == ["Qantas"]
+
+
+def test_unknown_location_matches_nothing():
+    assert airlines("London to Tokyo") == []
+    assert airlines("") == []
@@ -0,0 +1,69 @@
+import pandas as pd
+import sentiment_analyze
+from sentiment_analyze import aggregate, manifest_digest, review_hashes, update_aggregates
+
+
+def manifest(rows):  # rows of (Airline, Route, Reviews, sentiment_score)
+    df = pd.DataFrame(rows, columns=['Airline', 'Route', 'Reviews', 'sentiment_score'])
+    df['review_hash'] = review_hashes(df)
+    return df[['review_hash', 'Airline', 'Route', 'sentiment_score']]
+
+
+def assert_same_aggregates(actual, expected):
+    actual = actual.sort_values(['Route', 'Airline']).reset_index(drop=True)
+    expected = expected.sort_values(['Route', 'Airline']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual[['Route', 'Airline', 'count']], expected[['Route', 'Airline', 'count']],
+                                  check_dtype=False)
+    assert (actual['sum'] - expected['sum']).abs().max() < 1e-9
+
+
+OLD = [
+    ('Qatar Airways', 'Doha to Singapore', 'great seats', 0.6),
+    ('Qatar Airways', 'Doha to Singapore', 'late again', -0.4),
+    ('Emirates', 'Dubai to London', 'fine', 0.1),
+    ('Emirates', 'Dubai to London', 'fine', 0.1),  # the same review posted twice
+    ('Air France', 'Paris to London', 'rude crew', -0.7),
+]
+
+
+def test_incremental_update_matches_a_full_aggregate():
+    new = [
+        ('Qatar Airways', 'Doha to Singapore', 'great seats', 0.6),
+        ('Qatar Airways', 'Doha to Singapore', 'late again, but friendly', 0.2),  # edited
+        ('Emirates', 'Dubai to London', 'fine', 0.1),  # one of the duplicates removed
+        ('Emirates', 'Dubai to Paris', 'lovely', 0.9),  # appended, on a new route
+        ('Emirates', 'Dubai to Paris', 'lovely', 0.9),  # and duplicated
+        # Air France's only review removed
+    ]
+    old_manifest, new_manifest = manifest(OLD), manifest(new)
+    updated = update_aggregates(aggregate(old_manifest), old_manifest, new_manifest)
+    assert_same_aggregates(updated, aggregate(new_manifest))
+    assert 'Air France' not in set(updated['Airline'])
+
+
+def test_unchanged_reviews_leave_the_aggregates_alone():
+    old_manifest = manifest(OLD)
+    aggregates = aggregate(old_manifest)
+    assert update_aggregates(aggregates, old_manifest, manifest(OLD)) is aggregates
+
+
+def keep_fixture_scores(df, workers=None, chunk_size=2000):  # stands in for VADER: the fixture already has scores
+    return df
+
+
+def test_mismatched_aggregates_are_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentiment_analyze, 'score_dataframe', keep_fixture_scores)
+    reviews_path, output = tmp_path / 'reviews.csv', str(tmp_path / 'result.csv')
+    pd.DataFrame(OLD, columns=['Airline', 'Route', 'Reviews', 'sentiment_score']).to_csv(reviews_path, index=False)
+    sentiment_analyze.analyze(str(reviews_path), output)
+    aggregates_path = sentiment_analyze.companion_path(output, 'aggregates')
+    first_run = pd.read_csv(aggregates_path)
+
+    # a crash after the aggregates were written but before the manifest was: the next run must not apply the delta twice
+    stale = first_run.copy()
+    stale['count'] *= 2
+    stale['manifest_digest'] = 'from-another-run'
+    stale.to_csv(aggregates_path, index=False)
+    sentiment_analyze.analyze(str(reviews_path), output, incremental=True)
+    assert_same_aggregates(pd.read_csv(aggregates_path), first_run)
+    assert set(pd.read_csv(aggregates_path)['manifest_digest']) == {manifest_digest(manifest(OLD))}